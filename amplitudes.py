@@ -0,0 +1,205 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+"""Quantum state of pieces as amplitudes over squares.
+
+A piece is on exactly one square in every branch of its superposition,
+so of the qubits in its circuit exactly one is |1>. Its state is then
+fully described by one amplitude per square, and every gate on the
+circuit is a small linear map on those amplitudes:
+
+- a classical move relabels the square and applies the S gate (* i),
+- a split jump sends a to i·a/√2 on both targets,
+- a merge jump of a (from1) and b (from2) gives -i(a + b)/√2 on the
+  target and (b - a)/√2 on from2, leaving from1 empty.
+
+This follows from the split and merge matrices in `quantum_circuit`.
+An entangled pair is described the same way, with amplitudes over
+(square of the taken piece, square of the taker). The taken piece has
+no square (None) in the branches where it was taken.
+"""
+import math
+import random
+from typing import Optional
+
+from moves import Move, ClassicalMove, SplitMove, MergeMove
+
+SQRT_HALF = 1 / math.sqrt(2)
+
+# Chances below this are rounding errors of an amplitude that is 0
+ZERO_CHANCE = 1e-12
+
+
+def _columns(move: Move, square: Optional[int]):
+    """Where the piece on the square ends up after the move, as
+    (square, factor) pairs."""
+    if isinstance(move, ClassicalMove):
+        if square == move.from_index:
+            return ((move.to_index, 1j),)
+    elif isinstance(move, SplitMove):
+        if square == move.from_index:
+            return ((move.to_index1, 1j * SQRT_HALF),
+                    (move.to_index2, 1j * SQRT_HALF))
+    elif isinstance(move, MergeMove):
+        if square == move.from_index1:
+            return ((move.to_index, -1j * SQRT_HALF),
+                    (move.from_index2, -SQRT_HALF))
+        if square == move.from_index2:
+            return ((move.to_index, -1j * SQRT_HALF),
+                    (move.from_index2, SQRT_HALF))
+    return ((square, 1),)
+
+
+def _sample(amplitudes: dict):
+    """A key drawn with probability |amplitude|^2."""
+    chances = {key: abs(amplitude) ** 2
+               for key, amplitude in amplitudes.items()}
+    r = random.random() * sum(chances.values())
+    for key, chance in chances.items():
+        if chance > 0:
+            found = key
+            r -= chance
+            if r < 0:
+                break
+    return found
+
+
+class SquareAmplitudes:
+    """Amplitudes over the squares of one piece that is not entangled.
+
+    Squares without an amplitude (such as the one a piece left through a
+    merge) have amplitude 0.
+    """
+    amplitudes: dict[int, complex]
+
+    def __init__(self, square: int, moves_since_measure: int = 0):
+        self.amplitudes = {square: 1j ** (moves_since_measure % 4)}
+
+    @staticmethod
+    def from_moves(moves: list[Move], moves_since_measure: int):
+        """Replay a history that starts with the piece on the from square
+        of the first move."""
+        state = SquareAmplitudes(moves[0].from_index, moves_since_measure)
+        for move in moves:
+            state.apply_move(move)
+        return state
+
+    def copy(self):
+        state = SquareAmplitudes.__new__(SquareAmplitudes)
+        state.amplitudes = self.amplitudes.copy()
+        return state
+
+    def apply_move(self, move: Move, register: int = 0):
+        amplitudes = {}
+        for square, amplitude in self.amplitudes.items():
+            for to_square, factor in _columns(move, square):
+                amplitudes[to_square] = amplitudes.get(to_square, 0j)\
+                    + factor * amplitude
+        self.amplitudes = amplitudes
+
+    def chances(self, register: int = 0) -> dict[int, float]:
+        return {square: abs(amplitude) ** 2
+                for square, amplitude in self.amplitudes.items()}
+
+    def sample(self) -> int:
+        """Measure the piece, returns the square it is found on."""
+        return _sample(self.amplitudes)
+
+    def drop(self, squares, register: int = 0):
+        """Forget squares that the piece can not be on."""
+        for square in squares:
+            self.amplitudes.pop(square, None)
+
+
+class PairAmplitudes:
+    """Amplitudes of an entangled pair, over (taken square, taker square).
+
+    Register 0 is the taken piece and register 1 the piece that took it.
+    """
+    amplitudes: dict[tuple[Optional[int], int], complex]
+
+    @staticmethod
+    def entangle(taken: SquareAmplitudes, take_move: ClassicalMove,
+                 moves_since_measure: int, taken_index: int):
+        """The state right after the taker, with the given phase, jumped
+        over the taken piece that is in the given state.
+
+        In circuit terms: CCX(from, taken, to), CX(to, taken),
+        CX(to, from) and S(to)."""
+        phase = 1j ** (moves_since_measure % 4)
+        state = PairAmplitudes.__new__(PairAmplitudes)
+        state.amplitudes = {}
+        for square, amplitude in taken.amplitudes.items():
+            if square == taken_index:
+                key = (None, take_move.to_index)
+                amplitude *= phase * 1j
+            else:
+                key = (square, take_move.from_index)
+                amplitude *= phase
+            state.amplitudes[key] = amplitude
+        return state
+
+    @staticmethod
+    def from_moves(taken_moves: list[Optional[Move]],
+                   taken_moves_since_measure: int,
+                   taker_moves: list[Move], taker_moves_since_measure: int,
+                   taken_index: int):
+        """Replay the histories of both pieces, the entanglement
+        placeholder in the taken piece's history marks the take."""
+        placeholder = taken_moves.index(None)
+        taken = SquareAmplitudes.from_moves(taken_moves[:placeholder],
+                                            taken_moves_since_measure)
+        state = PairAmplitudes.entangle(taken, taker_moves[0],
+                                        taker_moves_since_measure, taken_index)
+        for move in taken_moves[placeholder + 1:]:
+            state.apply_move(move, 0)
+        for move in taker_moves[1:]:
+            state.apply_move(move, 1)
+        return state
+
+    def copy(self):
+        state = PairAmplitudes.__new__(PairAmplitudes)
+        state.amplitudes = self.amplitudes.copy()
+        return state
+
+    def apply_move(self, move: Move, register: int):
+        amplitudes = {}
+        for key, amplitude in self.amplitudes.items():
+            for square, factor in _columns(move, key[register]):
+                to_key = (square, key[1]) if register == 0 else (key[0], square)
+                amplitudes[to_key] = amplitudes.get(to_key, 0j)\
+                    + factor * amplitude
+        self.amplitudes = amplitudes
+
+    def chances(self, register: int) -> dict[int, float]:
+        """The chance of the piece in the register being on each square."""
+        chances = {}
+        for key, amplitude in self.amplitudes.items():
+            square = key[register]
+            if square is not None:
+                chances[square] = chances.get(square, 0.0) + abs(amplitude) ** 2
+        return chances
+
+    def sample(self) -> tuple[Optional[int], int]:
+        """Measure both pieces, returns their squares."""
+        return _sample(self.amplitudes)
+
+    def drop(self, squares, register: int):
+        """Forget squares that the piece in the register can not be on."""
+        self.amplitudes = {key: amplitude
+                           for key, amplitude in self.amplitudes.items()
+                           if key[register] not in squares}
@@ -15,6 +15,13 @@
 # You should have received a copy of the GNU Affero General Public
 # License along with Cheqqers. If not, see
 # <https://www.gnu.org/licenses/>.
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from uuid import UUID, uuid4
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -26,6 +33,47 @@ from players import MctsPlayer
 
 app = FastAPI()
 
+# CHEQQERS_MCTS_WORKERS sets the number of processes that search in
+# parallel for one move.
+MCTS_WORKERS = int(os.environ.get("CHEQQERS_MCTS_WORKERS", "1"))
+
+
+def new_opponent():
+    return MctsPlayer(is_white_player=False, args=dict(
+        MctsPlayer.DEFAULT_ARGS, num_workers=MCTS_WORKERS))
+
+
+class Opponents:
+    """The AI players of the most recently played games, so that each game
+    keeps its own search tree between moves.
+
+    Requests are handled on a thread pool and a player is not thread
+    safe, so every player comes with a lock. Only requests for the same
+    game wait for each other. Games without an id get a new player.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.players = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, game_id: Optional[UUID]):
+        """The player of the game and the lock to hold while using it."""
+        if game_id is None:
+            return new_opponent(), threading.Lock()
+        with self.lock:
+            entry = self.players.get(game_id)
+            if entry is None:
+                entry = (new_opponent(), threading.Lock())
+                self.players[game_id] = entry
+                if len(self.players) > self.max_size:
+                    self.players.popitem(last=False)
+            else:
+                self.players.move_to_end(game_id)
+        return entry
+
+
+opponents = Opponents(max_size=64)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -47,7 +95,7 @@ def get_start_state(game_type: str):
         game_type_enum = GameType.ENTANGLEMENT
     game = Game(size=8, start_rows=3,
                 game_type=game_type_enum)
-    return GameStateObject.from_game(game)
+    return GameStateObject.from_game(game, game_id=uuid4())
 
 
 @app.post("/move/{move_index}")
@@ -55,26 +103,34 @@ def read_item(move_index: int, game_state: GameStateObject,
               do_ai_move: bool):
     game = game_state.to_game()
 
-    moves = game.board.get_possible_moves(
-        game.turn, game.superpositions)
+    moves = game.get_possible_moves()
     game.apply_move(moves[move_index])
 
     if do_ai_move:
-        while game.turn != PieceColor.WHITE:
-            opponent = MctsPlayer(
-                is_white_player=(game.turn == PieceColor.WHITE))
-            opponent_move = opponent.get_move(game=game)
-            game.apply_move(opponent_move)
+        opponent, opponent_lock = opponents.get(game_state.game_id)
+        with opponent_lock:
+            while game.turn != PieceColor.WHITE:
+                opponent_move = opponent.get_move(game=game)
+                game.apply_move(opponent_move)
 
-    return GameStateObject.from_game(game)
+    return GameStateObject.from_game(game, game_id=game_state.game_id)
 
 @app.post("/ai-move")
-def do_ai_move(game_state: GameStateObject):
+def do_ai_move(game_state: GameStateObject,
+               time_limit: Optional[float] = None,
+               num_searches: Optional[int] = None):
+    # The time limit (in seconds) is for the whole request, the AI can
+    # move more than once. The number of searches is per move.
+    deadline = None
+    if time_limit is not None:
+        deadline = time.perf_counter() + time_limit
     game = game_state.to_game()
-    while game.turn != PieceColor.WHITE:
-        opponent = MctsPlayer(
-            is_white_player=(game.turn == PieceColor.WHITE))
-        opponent_move = opponent.get_move(game=game)
-        game.apply_move(opponent_move)
+    opponent, opponent_lock = opponents.get(game_state.game_id)
+    with opponent_lock:
+        while game.turn != PieceColor.WHITE:
+            if deadline is not None:
+                time_limit = max(0.0, deadline - time.perf_counter())
+            opponent_move = opponent.get_move(game, time_limit, num_searches)
+            game.apply_move(opponent_move)
 
-    return GameStateObject.from_game(game)
+    return GameStateObject.from_game(game, game_id=game_state.game_id)
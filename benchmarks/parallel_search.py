@@ -0,0 +1,87 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+"""Search iterations per move for the serial and parallel searches.
+
+Every mode searches the same positions with the same time limit, so
+the number of iterations it gets through is its throughput at equal
+wall time. The worker pools are started (and warmed up) before the
+measurement.
+
+Run from the root of the repository:
+
+    python benchmarks/parallel_search.py --workers 4 --time-limit 1
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enums import GameState, GameType  # noqa: E402
+from game import Game  # noqa: E402
+from mcts import MCTS  # noqa: E402
+
+
+def positions(amount, seed):
+    """Positions from random INTERFERENCE games, with a choice to make."""
+    random.seed(seed)
+    found = []
+    while len(found) < amount:
+        game = Game(8, 3, GameType.INTERFERENCE)
+        while game.get_game_state() == GameState.IN_PROGRESS\
+              and len(game.moves) < 40:
+            game.apply_move(random.choice(game.get_possible_moves()))
+            if len(game.moves) % 10 == 0\
+               and len(game.get_possible_moves()) > 1:
+                found.append(game.clone())
+    return found[:amount]
+
+
+def iterations(mcts, game, time_limit):
+    mcts.search(game, time_limit=time_limit)
+    if mcts.num_workers > 1:
+        return sum(mcts.root_visits.values())
+    return mcts.root.visit_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--time-limit", type=float, default=1.0)
+    parser.add_argument("--positions", type=int, default=5)
+    args = parser.parse_args()
+
+    search_args = {"C": 1.4, "num_simulations": 1, "rollout": 100}
+    modes = {
+        "serial": {},
+        "root parallel": {"num_workers": args.workers},
+        "batched rollouts": {"rollout_workers": args.workers},
+    }
+    games = positions(args.positions, seed=1)
+    print(f"{args.workers} workers, {args.time_limit} s per move")
+    for name, mode in modes.items():
+        mcts = MCTS(dict(search_args, **mode), GameState.WHITE_WON)
+        iterations(mcts, games[0], args.time_limit)  # Start the pools
+        total = sum(iterations(mcts, game, args.time_limit)
+                    for game in games)
+        print(f"{name:<20} {total / len(games):>10.0f} iterations per move")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+"""Startup cost of the entry points.
+
+Every entry point is imported in a fresh interpreter, which reports the
+time taken, the peak resident memory and whether numpy or cirq were
+loaded. The quantum rows also make the first chance query (amplitudes)
+and the first circuit simulation (cirq), the point at which those
+modules are expected to be loaded.
+
+Run from the root of the repository:
+
+    python benchmarks/startup.py --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = {
+    "game": "import game",
+    "players": "import players",
+    "main": "import main",
+    "api": "import api",
+    "classic game": """
+from enums import GameType
+from game import Game
+game = Game(8, 3, GameType.CLASSIC)
+for _ in range(10):
+    game.apply_move(game.get_possible_moves()[0])
+""",
+    "first chance query": """
+from enums import GameType
+from game import Game
+game = Game(8, 3, GameType.INTERFERENCE)
+game.apply_move(next(m for m in game.get_possible_moves()
+                     if type(m).__name__ == "SplitMove"))
+game.get_all_chances()
+""",
+    "cirq backend": """
+from enums import GameType
+from game import Game
+from quantum_backend import CirqBackend
+game = Game(8, 3, GameType.INTERFERENCE, backend=CirqBackend())
+game.apply_move(next(m for m in game.get_possible_moves()
+                     if type(m).__name__ == "SplitMove"))
+game.get_all_chances()
+""",
+}
+
+MEASURE = """
+import resource, sys, time, json
+start = time.perf_counter()
+exec({code!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "numpy": "numpy" in sys.modules,
+    "cirq": "cirq" in sys.modules,
+}}))
+"""
+
+
+def measure(code):
+    output = subprocess.run([sys.executable, "-c", MEASURE.format(code=code)],
+                            cwd=ROOT, check=True, capture_output=True,
+                            text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per entry point, the median is reported")
+    args = parser.parse_args()
+
+    print(f"{'entry point':<20} {'time (ms)':>12} {'rss (MB)':>10}"
+          f" {'numpy':>6} {'cirq':>6}")
+    for name, code in ENTRY_POINTS.items():
+        runs = [measure(code) for _ in range(args.repeat)]
+        seconds = statistics.median(run["seconds"] for run in runs)
+        rss = statistics.median(run["rss_mb"] for run in runs)
+        print(f"{name:<20} {seconds * 1000:>12.1f} {rss:>10.1f}"
+              f" {str(runs[0]['numpy']):>6} {str(runs[0]['cirq']):>6}")
+
+
+if __name__ == "__main__":
+    main()
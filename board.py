@@ -15,9 +15,13 @@
 # You should have received a copy of the GNU Affero General Public
 # License along with Cheqqers. If not, see
 # <https://www.gnu.org/licenses/>.
+from typing import Optional
+
 from enums import GameType, ClassicalSquareState, PieceColor
+from geometry import BoardGeometry, get_geometry
 from moves import Move, ClassicalMove, SplitMove, MergeMove
 from piece import Piece
+from zobrist import get_square_keys, square_key
 
 
 class Board:
@@ -25,42 +29,118 @@ class Board:
     game_type: GameType
     piece_map: list[Piece]
     classic_occupancy: list[ClassicalSquareState]
+    geometry: BoardGeometry
     xy_index_map: dict
     index_xy_map: dict
+    changed_squares: set[int]
+    journal: Optional[list[tuple]]
+    zobrist_keys: list[int]
+    hash: int
 
     def __init__(self, size, start_rows, game_type: GameType = GameType.INTERFERENCE):
         self.size = size
         self.game_type = game_type
         self.piece_map = []
         self.classic_occupancy = []
-        self.xy_index_map = {}
-        self.index_xy_map = {}
+
+        # Shared between all boards of this size, so never modify these
+        self.geometry = get_geometry(size)
+        self.xy_index_map = self.geometry.xy_index_map
+        self.index_xy_map = self.geometry.index_xy_map
+
+        # Squares written through set_square since the last time someone
+        # (the legal move tracker of the game) collected them
+        self.changed_squares = set()
+
+        # When set to a list, set_square and set_occupancy append the
+        # previous (index, piece, occupancy) to it so they can be undone
+        self.journal = None
 
         self.reset_board(start_rows)
 
+        # Zobrist hash of the squares, kept up to date by set_square and
+        # set_occupancy
+        self.zobrist_keys = get_square_keys(self.geometry.num_squares)
+        self.hash = self.compute_hash()
+
     def reset_board(self, start_rows):
-        i = 0
-        for y in range(self.size):
-            for x in range(self.size):
-                if (x+y) % 2 == 1:
-                    continue  # White square, not used
-
-                self.xy_index_map[(x, y)] = i
-                self.index_xy_map[i] = (x, y)
-
-                occupancy = ClassicalSquareState.OCCUPIED
-                if y < start_rows:
-                    self.piece_map.append(Piece(color=PieceColor.WHITE,
-                                                crowned=False))
-                elif y >= (self.size - start_rows):
-                    self.piece_map.append(Piece(color=PieceColor.BLACK,
-                                                crowned=False))
-                else:
-                    self.piece_map.append(None)
-                    occupancy = ClassicalSquareState.EMPTY
-                self.classic_occupancy.append(occupancy)
+        for y in self.geometry.rows:
+            occupancy = ClassicalSquareState.OCCUPIED
+            if y < start_rows:
+                self.piece_map.append(Piece(color=PieceColor.WHITE,
+                                            crowned=False))
+            elif y >= (self.size - start_rows):
+                self.piece_map.append(Piece(color=PieceColor.BLACK,
+                                            crowned=False))
+            else:
+                self.piece_map.append(None)
+                occupancy = ClassicalSquareState.EMPTY
+            self.classic_occupancy.append(occupancy)
+
+    def clone(self):
+        """Copy of the board, the pieces themselves are immutable and
+        shared."""
+        board = Board.__new__(Board)
+        board.size = self.size
+        board.game_type = self.game_type
+        board.piece_map = self.piece_map.copy()
+        board.classic_occupancy = self.classic_occupancy.copy()
+        board.geometry = self.geometry
+        board.xy_index_map = self.xy_index_map
+        board.index_xy_map = self.index_xy_map
+        board.changed_squares = self.changed_squares.copy()
+        board.journal = None
+        board.zobrist_keys = self.zobrist_keys
+        board.hash = self.hash
+        return board
+
+    def __getstate__(self):
+        # The tables only depend on the size, so they are left out when
+        # pickling (for the workers of a parallel search) and looked up
+        # again, which also shares them with the other boards there
+        state = self.__dict__.copy()
+        for name in ["geometry", "xy_index_map", "index_xy_map",
+                     "zobrist_keys"]:
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.geometry = get_geometry(self.size)
+        self.xy_index_map = self.geometry.xy_index_map
+        self.index_xy_map = self.geometry.index_xy_map
+        self.zobrist_keys = get_square_keys(self.geometry.num_squares)
 
-                i += 1
+    def compute_hash(self):
+        """The hash of the squares computed from scratch."""
+        h = 0
+        for i, (piece, occupancy) in enumerate(zip(self.piece_map,
+                                                   self.classic_occupancy)):
+            h ^= square_key(self.zobrist_keys, i, piece, occupancy)
+        return h
+
+    def set_square(self, index, piece, occupancy: ClassicalSquareState):
+        if self.journal is not None:
+            self.journal.append((index, self.piece_map[index],
+                                 self.classic_occupancy[index]))
+        self.hash ^= square_key(self.zobrist_keys, index,
+                                self.piece_map[index],
+                                self.classic_occupancy[index])\
+            ^ square_key(self.zobrist_keys, index, piece, occupancy)
+        self.piece_map[index] = piece
+        self.classic_occupancy[index] = occupancy
+        self.changed_squares.add(index)
+
+    def set_occupancy(self, index, occupancy: ClassicalSquareState):
+        if self.journal is not None:
+            self.journal.append((index, self.piece_map[index],
+                                 self.classic_occupancy[index]))
+        piece = self.piece_map[index]
+        self.hash ^= square_key(self.zobrist_keys, index, piece,
+                                self.classic_occupancy[index])\
+            ^ square_key(self.zobrist_keys, index, piece, occupancy)
+        self.classic_occupancy[index] = occupancy
+        self.changed_squares.add(index)
 
     def get_possible_moves(self, color: PieceColor, superpositions=None):
         take_moves = self.get_take_moves(color, superpositions)
@@ -68,122 +148,64 @@ class Board:
             return take_moves
         else:
             possible_moves = self._get_possible_moves(color, False, superpositions)
-            if self.game_type == GameType.INTERFERENCE:
-                return possible_moves
-            elif self.game_type == GameType.SUPERPOSITION or self.game_type == GameType.ENTANGLEMENT:
-                return [m for m in possible_moves if isinstance(m, ClassicalMove) or isinstance(m, SplitMove)]
-            elif self.game_type == GameType.CLASSIC:
-                return [m for m in possible_moves if isinstance(m, ClassicalMove)]
+            return self.filter_for_game_type(possible_moves)
+
+    def filter_for_game_type(self, moves: list[Move]):
+        if self.game_type == GameType.INTERFERENCE:
+            return moves
+        elif self.game_type == GameType.SUPERPOSITION or self.game_type == GameType.ENTANGLEMENT:
+            return [m for m in moves if isinstance(m, ClassicalMove) or isinstance(m, SplitMove)]
+        elif self.game_type == GameType.CLASSIC:
+            return [m for m in moves if isinstance(m, ClassicalMove)]
 
     def get_take_moves(self, color: PieceColor, superpositions):
         return self._get_possible_moves(color, True, superpositions)
 
     def _get_possible_moves(self, color: PieceColor, take: bool, superpositions):
         moves = []
-        for y in range(self.size):
-            for x in range(self.size):
-                if (x, y) not in self.xy_index_map:
-                    continue
-
-                i = self.xy_index_map[(x, y)]
-
-                if self.classic_occupancy[i] == ClassicalSquareState.EMPTY or\
-                   self.piece_map[i].color != color:
-                    continue
-
-                standard_dir = 1 if color == PieceColor.WHITE else -1
-                possible_squares = [(x - 1, y + standard_dir), (x + 1, y + standard_dir)]
-                if self.piece_map[i].crowned:
-                    possible_squares += [(x - 1, y - standard_dir), (x + 1, y - standard_dir)]
-
-                for (x_, y_) in possible_squares:
-                    if (x_, y_) not in self.xy_index_map:
-                        continue
-                    i_ = self.xy_index_map[(x_, y_)]
-                    if take:
-                        if self.classic_occupancy[i_] == ClassicalSquareState.EMPTY or\
-                           self.piece_map[i_].color == color:
-                            continue
-                        x_to = x_ + (x_ - x)
-                        y_to = y_ + (y_ - y)
-                        if (x_to, y_to) not in self.xy_index_map:
-                            continue
-                        i_to = self.xy_index_map[(x_to, y_to)]
-                        if self.classic_occupancy[i_to] != ClassicalSquareState.EMPTY:
-                            continue
-                        moves.append(ClassicalMove(
-                            is_take_move=True, from_index=i, to_index=i_to))
-                    else:
-                        if self.classic_occupancy[i_] != ClassicalSquareState.EMPTY:
-                            continue
-                        moves.append(ClassicalMove(
-                            is_take_move=False, from_index=i, to_index=i_))
+        for i in range(self.geometry.num_squares):
+            if self.classic_occupancy[i] == ClassicalSquareState.EMPTY or\
+               self.piece_map[i].color != color:
+                continue
+            moves += self.get_square_moves(i)[1 if take else 0]
 
         # Note: We don't allow split or merge moves with takes
         if not take:
-            moves += self._find_split_and_merge_moves(moves, superpositions)
+            moves += self.find_split_and_merge_moves(moves, superpositions)
 
         return moves
 
-    def _find_split_and_merge_moves(self, moves: list[Move], superpositions):
-        # Split moves
-        split_moves = []
-        for move in moves:
-            if len([mv for mv in split_moves
-                    if mv.from_index == move.from_index]) > 0:
-                continue
+    def get_square_moves(self, index):
+        """The classical moves and the take moves of the piece on one square."""
+        if self.classic_occupancy[index] == ClassicalSquareState.EMPTY:
+            return [], []
 
-            related_moves = [rm for rm in moves
-                             if rm.from_index == move.from_index]
-            if len(related_moves) < 2:
-                continue
-            for i in range(len(related_moves)):
-                for j in range(i + 1, len(related_moves)):
-                    split_moves.append(SplitMove(
-                        is_take_move=False,
-                        from_index=move.from_index,
-                        to_index1=related_moves[i].to_index,
-                        to_index2=related_moves[j].to_index))
-
-        # Merge moves
-        merge_moves = []
-        for move in moves:
-            if len([mv for mv in merge_moves
-                    if mv.to_index == move.to_index]) > 0:
-                continue
+        piece = self.piece_map[index]
+        color = piece.color
+        if piece.crowned:
+            steps = self.geometry.crowned_steps[color.value][index]
+        else:
+            steps = self.geometry.forward_steps[color.value][index]
 
-            related_moves = [rm for rm in moves
-                             if rm.to_index == move.to_index]
-            if len(related_moves) < 2:
-                continue
-            for i in range(len(related_moves)):
-                for j in range(i + 1, len(related_moves)):
-                    # Apply same piece and no-double occupancy rule
-                    if (
-                            self.from_same_piece(
-                                related_moves[i].from_index,
-                                related_moves[j].from_index, superpositions) and
-                            self.piece_map[related_moves[i].from_index].crowned ==
-                            self.piece_map[related_moves[j].from_index].crowned):
-
-                        merge_moves.append(MergeMove(
-                            is_take_move=False,
-                            from_index1=related_moves[i].from_index,
-                            from_index2=related_moves[j].from_index,
-                            to_index=move.to_index))
-
-        return split_moves + merge_moves
-
-    def from_same_piece(self, index1, index2, superpositions):
-        if superpositions is None:
-            return False
-
-        for superposition in superpositions:
-            if index1 in superposition.occupied_squares and\
-               index2 in superposition.occupied_squares:
-                return True
-
-        return False
+        moves = []
+        take_moves = []
+        for i_, i_to in steps:
+            occupancy = self.classic_occupancy[i_]
+            if occupancy == ClassicalSquareState.EMPTY:
+                moves.append(ClassicalMove(
+                    is_take_move=False, from_index=index, to_index=i_))
+            elif i_to is not None and\
+                    self.piece_map[i_].color != color and\
+                    self.classic_occupancy[i_to] == ClassicalSquareState.EMPTY:
+                take_moves.append(ClassicalMove(
+                    is_take_move=True, from_index=index, to_index=i_to))
+        return moves, take_moves
+
+    def find_split_and_merge_moves(self, moves: list[Move], superpositions,
+                                   superposition_index=None):
+        return find_split_and_merge_moves(
+            moves, superpositions, superposition_index,
+            lambda index: self.piece_map[index].crowned)
 
     def display(self):
         """Display the current board state"""
@@ -207,3 +229,64 @@ class Board:
         for x in range(self.size):
             board_display += f"{x} "
         return board_display
+
+
+def build_superposition_index(superpositions):
+    """Map every square to the superposition that occupies it."""
+    superposition_index = {}
+    for superposition in superpositions or []:
+        for square in superposition.occupied_squares:
+            superposition_index[square] = superposition
+    return superposition_index
+
+
+def find_split_and_merge_moves(moves: list[Move], superpositions,
+                               superposition_index, is_crowned):
+    """Combine classical moves into split and merge moves.
+
+    The moves are grouped by their from and to squares in one pass. A
+    merge is only allowed between two squares of the same superposition,
+    which is looked up in the superposition index (built from the
+    superpositions when it isn't given).
+    """
+    by_from = {}
+    by_to = {}
+    for move in moves:
+        by_from.setdefault(move.from_index, []).append(move)
+        by_to.setdefault(move.to_index, []).append(move)
+
+    # Split moves
+    split_moves = []
+    for from_index, related_moves in by_from.items():
+        for i in range(len(related_moves)):
+            for j in range(i + 1, len(related_moves)):
+                split_moves.append(SplitMove(
+                    is_take_move=False,
+                    from_index=from_index,
+                    to_index1=related_moves[i].to_index,
+                    to_index2=related_moves[j].to_index))
+
+    # Merge moves
+    merge_moves = []
+    for to_index, related_moves in by_to.items():
+        if len(related_moves) < 2:
+            continue
+        if superposition_index is None:
+            superposition_index = build_superposition_index(superpositions)
+        for i in range(len(related_moves)):
+            for j in range(i + 1, len(related_moves)):
+                from1 = related_moves[i].from_index
+                from2 = related_moves[j].from_index
+                superposition = superposition_index.get(from1)
+                # Apply same piece and no-double occupancy rule
+                if (
+                        superposition is not None and
+                        superposition is superposition_index.get(from2) and
+                        is_crowned(from1) == is_crowned(from2)):
+                    merge_moves.append(MergeMove(
+                        is_take_move=False,
+                        from_index1=from1,
+                        from_index2=from2,
+                        to_index=to_index))
+
+    return split_moves + merge_moves
@@ -15,13 +15,80 @@
 # You should have received a copy of the GNU Affero General Public
 # License along with Cheqqers. If not, see
 # <https://www.gnu.org/licenses/>.
-import cirq
-import numpy as np
+from typing import Optional
+from uuid import UUID
 
 from enums import GameType, ClassicalSquareState, PieceColor, GameState
 from moves import Move, ClassicalMove, SplitMove, MergeMove
-from board import Board
-from quantum_state import PieceSuperposition, PieceEntanglement
+from amplitudes import SquareAmplitudes, ZERO_CHANCE
+from board import Board, build_superposition_index
+from legal_moves import LegalMoves
+from quantum_backend import QuantumBackend, AmplitudeBackend
+from quantum_state import PieceSuperposition, PieceEntanglement, copy_state
+from zobrist import ALLOW_DRAWS, BLACK_TO_MOVE, GAME_TYPE, MOVES_SINCE_TAKE,\
+    MOVES_SINCE_TAKE_BUCKETS
+
+
+class UndoRecord:
+    """What `Game.undo_move` needs to take back one `Game.apply_move`."""
+    __slots__ = ("journal", "turn", "moves_since_take", "num_moves",
+                 "superpositions", "entanglements", "quantum_hash",
+                 "version", "cache")
+
+    def __init__(self, game):
+        self.journal = []
+        self.turn = game.turn
+        self.moves_since_take = game.moves_since_take
+        self.num_moves = len(game.moves)
+        # Superpositions change in place, so keep their squares and the
+        # length of their history
+        states = {}
+        self.superpositions = [
+            (s, s.occupied_squares.copy(), len(s.moves), s.moves_since_measure,
+             s.digest, copy_state(s.state, states), s.register)
+            for s in game.superpositions]
+        self.entanglements = game.entanglements.copy()
+        self.quantum_hash = game.quantum_hash
+        self.version = game.version
+        self.cache = game._cache.copy()
+
+
+class OutcomePath:
+    """Picks the collapse of every measurement during one move, so that
+    `Game.outcome_distribution` can walk all of them.
+
+    The first measurements collapse to the outcomes given by `path`, the
+    later ones to their first outcome. The possible outcomes only depend
+    on the collapses before them, so they are computed once and shared
+    through `outcomes_cache`.
+    """
+    path: tuple[int, ...]
+    chosen: list[int]
+    counts: list[int]
+    probability: float
+
+    def __init__(self, path, outcomes_cache):
+        self.path = path
+        self.chosen = []
+        self.counts = []
+        self.probability = 1.0
+        self.outcomes_cache = outcomes_cache
+
+    def choose(self, game, superposition) -> dict[int, bool]:
+        key = tuple(self.chosen)
+        outcomes = self.outcomes_cache.get(key)
+        if outcomes is None:
+            state = game.backend.build_state(game, superposition)
+            outcomes = game.backend.outcomes(state)
+            self.outcomes_cache[key] = outcomes
+
+        depth = len(self.chosen)
+        index = self.path[depth] if depth < len(self.path) else 0
+        self.chosen.append(index)
+        self.counts.append(len(outcomes))
+        probability, square_found = outcomes[index]
+        self.probability *= probability
+        return square_found
 
 
 class Game:
@@ -33,10 +100,18 @@ class Game:
     moves_since_take: int
     superpositions: list[PieceSuperposition]
     entanglements: list[PieceEntanglement]
+    backend: QuantumBackend
+    legal_moves: LegalMoves
+    superposition_index: dict[int, PieceSuperposition]
+    entanglement_index: dict[UUID, PieceEntanglement]
+    quantum_hash: int
+    version: int
+    undo_stack: list[UndoRecord]
 
     def __init__(self, size, start_rows,
                  game_type: GameType = GameType.INTERFERENCE,
-                 allow_draws: bool = True):
+                 allow_draws: bool = True,
+                 backend: Optional[QuantumBackend] = None):
         self.board = Board(size, start_rows, game_type)
         self.allow_draws = allow_draws
         self.game_type = game_type
@@ -45,19 +120,193 @@ class Game:
         self.moves_since_take = 0
         self.superpositions = []
         self.entanglements = []
+        self.backend = backend if backend is not None else AmplitudeBackend()
+        self.legal_moves = LegalMoves(self.board)
+        self.superposition_index = {}
+        self.entanglement_index = {}
+
+        # The digests of all superpositions xor-ed together, the quantum
+        # part of the position hash
+        self.quantum_hash = 0
+
+        # Increased on every change of the position, results that only
+        # depend on the position are cached per version.
+        self.version = 0
+        self._cache = {}
+
+        # The chances per superposition uuid, together with the digests of
+        # the superpositions they were computed for
+        self._chance_cache = {}
+
+        self.undo_stack = []
+        self._outcome_path = None
+
+    def clone(self):
+        """Copy of the game that can be played on independently.
+
+        Much cheaper than a deepcopy: the board arrays and the lists are
+        copied, the pieces and moves are immutable and shared. The
+        entanglements refer to the copied superpositions.
+        """
+        game = Game.__new__(Game)
+        game.board = self.board.clone()
+        game.allow_draws = self.allow_draws
+        game.game_type = self.game_type
+        game.moves = self.moves.copy()
+        game.turn = self.turn
+        game.moves_since_take = self.moves_since_take
+        game.backend = self.backend
+
+        states = {}
+        clones = {id(s): s.clone(states) for s in self.superpositions}
+        game.superpositions = list(clones.values())
+        game.entanglements = [
+            PieceEntanglement(
+                superposition_taken=clones[id(e.superposition_taken)],
+                superposition_from=clones[id(e.superposition_from)])
+            for e in self.entanglements]
+        game.legal_moves = self.legal_moves.clone(game.board)
+        game._rebuild_quantum_indexes()
+        game.quantum_hash = self.quantum_hash
+
+        game.version = self.version
+        game._cache = self._cache.copy()
+        game._chance_cache = self._chance_cache.copy()
+        game.undo_stack = []
+        game._outcome_path = None
+        return game
+
+    def refresh(self):
+        """Rebuild the state that is derived from the board and the
+        superpositions, needed after they are modified directly instead of
+        through apply_move."""
+        self.legal_moves = LegalMoves(self.board)
+        self._rebuild_quantum_indexes()
+        self._rebuild_hashes()
+        self.version += 1
+
+    def _rebuild_hashes(self):
+        self.board.hash = self.board.compute_hash()
+        take_moves = {id(e.superposition_taken): e.superposition_from.moves[0]
+                      for e in self.entanglements}
+        self.quantum_hash = 0
+        for superposition in self.superpositions:
+            self.quantum_hash ^= superposition.compute_digest(
+                take_moves.get(id(superposition)))
+
+    def get_position_hash(self) -> int:
+        """64-bit Zobrist hash of the position.
+
+        It covers the squares, the side to move, moves_since_take (up to
+        the draw limit), the superpositions and entanglements and the
+        rules (game_type and allow_draws). Equal positions reached by
+        different move orders get the same hash.
+        """
+        h = self.board.hash ^ self.quantum_hash ^ MOVES_SINCE_TAKE[
+            min(self.moves_since_take, MOVES_SINCE_TAKE_BUCKETS - 1)]\
+            ^ GAME_TYPE[self.game_type]
+        if self.turn == PieceColor.BLACK:
+            h ^= BLACK_TO_MOVE
+        if self.allow_draws:
+            h ^= ALLOW_DRAWS
+        return h
+
+    def _rebuild_quantum_indexes(self):
+        self.superposition_index = build_superposition_index(self.superpositions)
+        self.entanglement_index = {}
+        for entanglement in self.entanglements:
+            self.entanglement_index[entanglement.superposition_taken.uuid] = entanglement
+            self.entanglement_index[entanglement.superposition_from.uuid] = entanglement
+
+    def _index_superposition(self, superposition: PieceSuperposition):
+        for square in superposition.occupied_squares:
+            self.superposition_index[square] = superposition
+
+    def _unindex_superposition(self, superposition: PieceSuperposition):
+        for square in superposition.occupied_squares:
+            if self.superposition_index.get(square) is superposition:
+                del self.superposition_index[square]
+
+    def _cached(self, key, compute):
+        cached = self._cache.get(key)
+        if cached is None or cached[0] != self.version:
+            cached = (self.version, compute())
+            self._cache[key] = cached
+        return cached[1]
+
+    def get_possible_moves(self):
+        # Copied, since callers are free to modify the list they get
+        return list(self._cached("possible_moves", self._get_possible_moves))
+
+    def _get_possible_moves(self):
+        return self.legal_moves.get_possible_moves(
+            self.turn, self.superpositions, self.superposition_index)
 
     def get_game_state(self) -> GameState:
+        return self._cached("game_state", self._get_game_state)
+
+    def _get_game_state(self) -> GameState:
         if self.allow_draws and self.moves_since_take >= 40:
             return GameState.DRAW
 
-        moves = self.board.get_possible_moves(self.turn, self.superpositions)
+        moves = self._cached("possible_moves", self._get_possible_moves)
         if len(moves) == 0:
             return GameState.WHITE_WON if self.turn == PieceColor.BLACK\
                 else GameState.BLACK_WON
 
         return GameState.IN_PROGRESS
 
-    def apply_move(self, move: Move):
+    def apply_move(self, move: Move, record_undo: bool = False):
+        """Play the move for the side to move.
+
+        With record_undo the move can be taken back with undo_move, also
+        when it caused a measurement.
+        """
+        if record_undo:
+            record = UndoRecord(self)
+            self.board.journal = record.journal
+            try:
+                self._apply_move(move)
+            finally:
+                self.board.journal = None
+            self.undo_stack.append(record)
+        else:
+            self._apply_move(move)
+
+    def undo_move(self):
+        """Take back the last move applied with record_undo."""
+        record = self.undo_stack.pop()
+
+        for index, piece, occupancy in reversed(record.journal):
+            self.board.set_square(index, piece, occupancy)
+
+        self.turn = record.turn
+        self.moves_since_take = record.moves_since_take
+        del self.moves[record.num_moves:]
+
+        self.superpositions = []
+        for superposition, occupied_squares, num_moves, moves_since_measure,\
+                digest, state, register in record.superpositions:
+            superposition.occupied_squares = occupied_squares
+            del superposition.moves[num_moves:]
+            superposition.moves_since_measure = moves_since_measure
+            superposition.digest = digest
+            superposition.state = state
+            superposition.register = register
+            self.superpositions.append(superposition)
+        self.entanglements = record.entanglements
+        self.quantum_hash = record.quantum_hash
+        self._rebuild_quantum_indexes()
+
+        # A new version, a version number is never used for two positions.
+        # What was cached for the old position is still valid.
+        self.version += 1
+        self._cache = {key: (self.version, value)
+                       for key, (version, value) in record.cache.items()
+                       if version == record.version}
+
+    def _apply_move(self, move: Move):
+        self.version += 1
         self.moves_since_take += 1
         canceled = False
         taken = False
@@ -76,33 +325,45 @@ class Game:
         if taken or (not canceled and move.is_take_move):
             self.moves_since_take = 0
 
-        last_row = 0 if self.turn == PieceColor.BLACK else self.board.size - 1
+        crowning = self.board.geometry.crowning[self.turn.value]
         if not move.is_take_move or\
            not self._has_another_take_move(self.turn, move) or\
-           self.board.index_xy_map[move.to_index][1] == last_row: # Also reset if piece is kinged
+           crowning[move.to_index]: # Also reset if piece is kinged
             self.turn = self.turn.other()
 
     def _has_another_take_move(self, turn: PieceColor, move: ClassicalMove):
-        next_moves = self.board.get_take_moves(turn, None)
-        return len([m for m in next_moves
-                    if m.from_index == move.to_index]) > 0
+        # Only the piece that just landed can continue taking
+        piece = self.board.piece_map[move.to_index]
+        if self.board.classic_occupancy[move.to_index] == ClassicalSquareState.EMPTY or\
+           piece.color != turn:
+            return False
+        return self.legal_moves.has_take_move(move.to_index)
+
+    def _crown_if_on_last_row(self, piece, to_index):
+        if not piece.crowned and\
+           self.board.geometry.crowning[piece.color.value][to_index]:
+            piece = piece.crown()
+        return piece
 
     def _find_superposition_on_square(self, square_id):
-        for superposition in self.superpositions:
-            if square_id in superposition.occupied_squares:
-                return superposition
+        superposition = self.superposition_index.get(square_id)
+        if superposition is None and\
+           self.board.classic_occupancy[square_id] == ClassicalSquareState.QUANTUM:
+            # The superpositions were changed without going through
+            # apply_move, so the index has to catch up.
+            self._rebuild_quantum_indexes()
+            superposition = self.superposition_index.get(square_id)
+        return superposition
+
+    def _find_entanglement(self, superposition: PieceSuperposition):
+        return self.entanglement_index.get(superposition.uuid)
 
     def _is_entangled(self, square_id):
         superposition = self._find_superposition_on_square(square_id)
         if superposition is None:
             return False
 
-        for entanglement in self.entanglements:
-            if entanglement.superposition_from == superposition or\
-               entanglement.superposition_taken == superposition:
-                return True
-
-        return False
+        return self._find_entanglement(superposition) is not None
 
     def _apply_classical_move(self, move: ClassicalMove):
         if move.is_take_move:
@@ -113,25 +374,22 @@ class Game:
 
         if occupancy_state == ClassicalSquareState.QUANTUM:
             superposition = self._find_superposition_on_square(move.from_index)
+            self._unindex_superposition(superposition)
+            self.quantum_hash ^= superposition.digest
             superposition.apply_move(move)
+            self.quantum_hash ^= superposition.digest
+            self._index_superposition(superposition)
         else:
             piece = piece.apply_phase()
 
         # Check if the piece should be crowned (reached the opposite edge)
-        if not piece.crowned:
-            to_x, to_y = self.board.index_xy_map[move.to_index]
-            if (piece.color == PieceColor.WHITE and to_y == self.board.size - 1) or \
-               (piece.color == PieceColor.BLACK and to_y == 0):
-                piece = piece.copy()
-                piece.crowned = True
+        piece = self._crown_if_on_last_row(piece, move.to_index)
 
         # Move the piece to the new position
-        self.board.piece_map[move.to_index] = piece
-        self.board.classic_occupancy[move.to_index] = occupancy_state
+        self.board.set_square(move.to_index, piece, occupancy_state)
 
         # Clear the original position
-        self.board.piece_map[move.from_index] = None
-        self.board.classic_occupancy[move.from_index] = ClassicalSquareState.EMPTY
+        self.board.set_square(move.from_index, None, ClassicalSquareState.EMPTY)
 
         return False, False
 
@@ -139,23 +397,13 @@ class Game:
         piece = self.board.piece_map[move.from_index]
         from_occupancy = self.board.classic_occupancy[move.from_index]
 
-        # Calculate the position of the taken piece
-        from_x, from_y = self.board.index_xy_map[move.from_index]
-        to_x, to_y = self.board.index_xy_map[move.to_index]
-
         # The taken piece is in between the from and to positions
-        taken_x = (from_x + to_x) // 2
-        taken_y = (from_y + to_y) // 2
-        taken_index = self.board.xy_index_map[(taken_x, taken_y)]
+        taken_index = self.board.geometry.get_jumped_over(
+            move.from_index, move.to_index)
         taken_occupancy = self.board.classic_occupancy[taken_index]
 
         # Check if the piece should be crowned (reached the opposite edge)
-        if not piece.crowned:
-            to_x, to_y = self.board.index_xy_map[move.to_index]
-            if (piece.color == PieceColor.WHITE and to_y == self.board.size - 1) or \
-               (piece.color == PieceColor.BLACK and to_y == 0):
-                piece = piece.copy()
-                piece.crowned = True
+        piece = self._crown_if_on_last_row(piece, move.to_index)
 
         if (
                 from_occupancy == ClassicalSquareState.OCCUPIED and
@@ -163,24 +411,30 @@ class Game:
                 not self._is_entangled(taken_index)):
             if self.game_type == GameType.ENTANGLEMENT or self.game_type == GameType.INTERFERENCE:
                 # This is the only condition in which we entangle
-                self.board.classic_occupancy[move.from_index] = ClassicalSquareState.QUANTUM
-                self.board.classic_occupancy[move.to_index] = ClassicalSquareState.QUANTUM
-                self.board.piece_map[move.to_index] = piece
+                self.board.set_occupancy(move.from_index, ClassicalSquareState.QUANTUM)
+                self.board.set_square(move.to_index, piece, ClassicalSquareState.QUANTUM)
 
                 superposition_taken = self._find_superposition_on_square(taken_index)
-                superposition_taken.insert_entanglement_placeholder()
+                self.get_quantum_state(superposition_taken)
+                self.quantum_hash ^= superposition_taken.digest
+                superposition_taken.insert_entanglement_placeholder(move)
                 superposition_from = PieceSuperposition.create(move, piece.moves_since_measure)
+                self.quantum_hash ^= superposition_taken.digest ^ superposition_from.digest
 
+                entanglement = PieceEntanglement(
+                    superposition_taken=superposition_taken,
+                    superposition_from=superposition_from)
+                entanglement.entangle(taken_index)
                 self.superpositions.append(superposition_from)
-                self.entanglements.append(
-                    PieceEntanglement(
-                        superposition_taken=superposition_taken,
-                        superposition_from=superposition_from))
+                self.entanglements.append(entanglement)
+                self._index_superposition(superposition_from)
+                self.entanglement_index[superposition_taken.uuid] = entanglement
+                self.entanglement_index[superposition_from.uuid] = entanglement
 
                 # But the taken piece is definitely not there anymore
-                self.board.classic_occupancy[taken_index] = ClassicalSquareState.EMPTY
-                self.board.piece_map[taken_index] = None
+                self.board.set_square(taken_index, None, ClassicalSquareState.EMPTY)
                 superposition_taken.occupied_squares.remove(taken_index)
+                del self.superposition_index[taken_index]
 
                 return True, False  # This does not count as a take
             else:
@@ -213,16 +467,13 @@ class Game:
         piece = piece.apply_phase()
 
         # Remove the taken piece
-        self.board.piece_map[taken_index] = None
-        self.board.classic_occupancy[taken_index] = ClassicalSquareState.EMPTY
+        self.board.set_square(taken_index, None, ClassicalSquareState.EMPTY)
 
         # Move the piece to the new position
-        self.board.piece_map[move.to_index] = piece
-        self.board.classic_occupancy[move.to_index] = ClassicalSquareState.OCCUPIED
+        self.board.set_square(move.to_index, piece, ClassicalSquareState.OCCUPIED)
 
         # Clear the original position
-        self.board.piece_map[move.from_index] = None
-        self.board.classic_occupancy[move.from_index] = ClassicalSquareState.EMPTY
+        self.board.set_square(move.from_index, None, ClassicalSquareState.EMPTY)
 
         return False, True
 
@@ -232,208 +483,67 @@ class Game:
 
         if self.board.classic_occupancy[move.from_index] == ClassicalSquareState.QUANTUM:
             superposition = self._find_superposition_on_square(move.from_index)
+            self._unindex_superposition(superposition)
+            self.quantum_hash ^= superposition.digest
             superposition.apply_move(move)
         else:
-            self.superpositions.append(PieceSuperposition.create(move, piece.moves_since_measure))
+            superposition = PieceSuperposition.create(move, piece.moves_since_measure)
+            self.superpositions.append(superposition)
+        self.quantum_hash ^= superposition.digest
+        self._index_superposition(superposition)
 
-        self.board.classic_occupancy[move.from_index] = ClassicalSquareState.EMPTY
-        self.board.piece_map[move.from_index] = None
+        self.board.set_square(move.from_index, None, ClassicalSquareState.EMPTY)
 
         # Check if the piece should be crowned (reached the opposite edge)
-        if not piece.crowned:
-            to_x, to_y = self.board.index_xy_map[move.to_index1]
-            if (piece.color == PieceColor.WHITE and to_y == self.board.size - 1) or \
-               (piece.color == PieceColor.BLACK and to_y == 0):
-                piece = piece.copy()
-                piece.crowned = True
+        piece = self._crown_if_on_last_row(piece, move.to_index1)
 
         for i in [move.to_index1, move.to_index2]:
-            self.board.classic_occupancy[i] = ClassicalSquareState.QUANTUM
-            self.board.piece_map[i] = piece
+            self.board.set_square(i, piece, ClassicalSquareState.QUANTUM)
 
     def _apply_merge_move(self, move: MergeMove):
         piece = self.board.piece_map[move.from_index1]
 
         superposition = self._find_superposition_on_square(move.from_index1)
+        self.quantum_hash ^= superposition.digest
         superposition.apply_move(move)
+        self.quantum_hash ^= superposition.digest
+        self._index_superposition(superposition)
 
         # Check if the piece should be crowned (reached the opposite edge)
-        if not piece.crowned:
-            to_x, to_y = self.board.index_xy_map[move.to_index]
-            if (piece.color == PieceColor.WHITE and to_y == self.board.size - 1) or \
-               (piece.color == PieceColor.BLACK and to_y == 0):
-                piece = piece.copy()
-                piece.crowned = True
-
-        self.board.classic_occupancy[move.to_index] = ClassicalSquareState.QUANTUM
-        self.board.piece_map[move.to_index] = piece
-
-    def _get_circuit_for_square(self, square_index):
-        def handle_move(qubit_by_current_square, circuit, qubit_name_counter, prefix):
-            def add_prefix(index):
-                return f"{prefix}-{index}"
-
-            if isinstance(move, ClassicalMove) and not move.is_take_move:
-                # Simply change the mapping of the qubit and then add a S gate for the phase.
-                qubit = qubit_by_current_square[add_prefix(move.from_index)]
-                qubit_by_current_square[add_prefix(move.to_index)] = qubit
-                del qubit_by_current_square[add_prefix(move.from_index)]
-
-                circuit.append(cirq.S(qubit_by_current_square[add_prefix(move.to_index)]))
-            elif isinstance(move, SplitMove):
-                # Here we create a new qubit for the superposition
-                qubit_from = qubit_by_current_square[add_prefix(move.from_index)]
-                qubit_by_current_square[add_prefix(move.to_index1)] = cirq.NamedQubit(f"{qubit_name_counter}")
-                qubit_name_counter += 1
-                del qubit_by_current_square[add_prefix(move.from_index)]
-
-                qubit_by_current_square[add_prefix(move.to_index2)] = cirq.NamedQubit(f"{qubit_name_counter}")
-                qubit_name_counter += 1
-
-                # From quantum chess split
-                split_jump = np.array([
-                    [1, 0, 0, 0, 0, 0, 0, 0],
-                    [0, 0, 0, 0, 1j, 0, 0, 0],
-                    [0, 1j/np.sqrt(2), 1/np.sqrt(2), 0, 0, 0, 0, 0],
-                    [0, 0, 0, 0, 0, -1/np.sqrt(2), 1j/np.sqrt(2), 0],
-                    [0, 1j/np.sqrt(2), -1/np.sqrt(2), 0, 0, 0, 0, 0],
-                    [0, 0, 0, 0, 0, 1j/np.sqrt(2), -1/np.sqrt(2), 0],
-                    [0, 0, 0, 1j, 0, 0, 0, 0],
-                    [0, 0, 0, 0, 0, 0, 0, 1],
-                ])
-
-                circuit.append(cirq.MatrixGate(split_jump).on(
-                    qubit_by_current_square[add_prefix(move.to_index1)],
-                    qubit_by_current_square[add_prefix(move.to_index2)],
-                    qubit_from))
-            elif isinstance(move, MergeMove):
-                # From quantum chess merge jum
-                merge_jump = np.array([
-                    [1, 0, 0, 0, 0, 0, 0, 0],
-                    [0, 0, -1j/np.sqrt(2), 0, -1j/np.sqrt(2), 0, 0, 0],
-                    [0, 0, 1/np.sqrt(2), 0, -1/np.sqrt(2), 0, 0, 0],
-                    [0, 0, 0, 0, 0, 0, -1j, 0],
-                    [0, -1j, 0, 0, 0, 0, 0, 0],
-                    [0, 0, 0, -1/np.sqrt(2), 0, -1j/np.sqrt(2), 0, 0],
-                    [0, 0, 0, -1j/np.sqrt(2), 0, -1/np.sqrt(2), 0, 0],
-                    [0, 0, 0, 0, 0, 0, 0, 1],
-                ])
-
-                # Add a qubit for the target
-                qubit_by_current_square[add_prefix(move.to_index)] = cirq.NamedQubit(f"{qubit_name_counter}")
-                qubit_name_counter += 1
-
-                # Now apply the matrix
-                circuit.append(cirq.MatrixGate(merge_jump).on(
-                    qubit_by_current_square[add_prefix(move.from_index1)],
-                    qubit_by_current_square[add_prefix(move.from_index2)],
-                    qubit_by_current_square[add_prefix(move.to_index)]))
-
-            return qubit_name_counter
-
-        superposition = self._find_superposition_on_square(square_index)
-
-        superposition_from = None
-        entanglement = None
-        if self._is_entangled(square_index):
-            for e in self.entanglements:
-                if e.superposition_from == superposition or\
-                   e.superposition_taken == superposition:
-                    entanglement = e
-                    superposition = e.superposition_taken
-                    superposition_from = e.superposition_from
-                    break
-
-        prefix = "to_be_captured"
-        qubit_name_counter = 0
-        qubit_by_current_square = {
-            f"{prefix}-{superposition.moves[0].from_index}":
-            cirq.NamedQubit(f"{qubit_name_counter}")
-        }
-        qubit_name_counter += 1
-
-        # Create a quantum circuit
-        circuit = cirq.Circuit()
-
-        # Set up the initial state - we know the initial square was occupied
-        # Initialize the first qubit to |1⟩ (occupied)
-        circuit.append(cirq.X(qubit_by_current_square[
-            f"{prefix}-{superposition.moves[0].from_index}"]))
-
-        # Now apply the phase
-        for i in range(superposition.moves_since_measure % 4):
-            circuit.append(cirq.S(qubit_by_current_square[
-                f"{prefix}-{superposition.moves[0].from_index}"]))
-
-        taker_prefix = "taker"
-        # Apply the gates corresponding to each move in the superposition's history
-        for move in superposition.moves:
-            if move is None:
-                # This is where the entanglement magic should happen
-                # We set up the circuit for the taken part so far, and
-                # now we need to entangle it with the part that is
-                # taking it. This part doesn't start in superposition!
-                # We apply the first move of the superposition_from on both together.
-                take_move = superposition_from.moves[0]
-
-                # We need a new qubit for the piece that is taking
-                qubit_by_current_square[f"{taker_prefix}-{take_move.from_index}"]\
-                    = cirq.NamedQubit(f"{qubit_name_counter}")
-                qubit_name_counter += 1
-                # It should be initialized to 1
-                circuit.append(cirq.X(
-                    qubit_by_current_square[f"{taker_prefix}-{take_move.from_index}"]))
-
-                # Now apply the phase
-                for i in range(superposition_from.moves_since_measure % 4):
-                    circuit.append(cirq.S(qubit_by_current_square[
-                        f"{taker_prefix}-{take_move.from_index}"]))
-
-                # We also need a new qubit for where the piece is taking to
-                qubit_by_current_square[f"{taker_prefix}-{take_move.to_index}"]\
-                    = cirq.NamedQubit(f"{qubit_name_counter}")
-                qubit_name_counter += 1
-
-                # We need to find the square that is taken
-                from_x, from_y = self.board.index_xy_map[take_move.from_index]
-                to_x, to_y = self.board.index_xy_map[take_move.to_index]
-                taken_x = (from_x + to_x) // 2
-                taken_y = (from_y + to_y) // 2
-                taken_index = self.board.xy_index_map[(taken_x, taken_y)]
-
-                # Now we need to apply the gate on these three qubits
-                # This is simply a CCNOT (we only take if both are there)
-                # Followed by two CNOTs to remove the taken piece
-                # Followed by an S gate for the phase change on the moving piece
-                circuit.append(cirq.CCX(
-                    qubit_by_current_square[f"{taker_prefix}-{take_move.from_index}"],
-                    qubit_by_current_square[f"{prefix}-{taken_index}"],
-                    qubit_by_current_square[f"{taker_prefix}-{take_move.to_index}"])) 
-                circuit.append(cirq.CX(
-                    qubit_by_current_square[f"{taker_prefix}-{take_move.to_index}"],
-                    qubit_by_current_square[f"{prefix}-{taken_index}"]))
-                circuit.append(cirq.CX(
-                    qubit_by_current_square[f"{taker_prefix}-{take_move.to_index}"],
-                    qubit_by_current_square[f"{taker_prefix}-{take_move.from_index}"]))
-                circuit.append(cirq.S(
-                    qubit_by_current_square[f"{taker_prefix}-{take_move.to_index}"]))
-
-                del qubit_by_current_square[f"{prefix}-{taken_index}"]
-            else:
-                qubit_name_counter\
-                    = handle_move(qubit_by_current_square,
-                                  circuit, qubit_name_counter, prefix)
-
-        if superposition_from is not None:
-            # We are entangled, so we still have to do the other part.
-            # We already did the first move
-            for move in superposition_from.moves[1:]:
-                qubit_name_counter\
-                    = handle_move(qubit_by_current_square,
-                                  circuit, qubit_name_counter, taker_prefix)
-
-        return circuit, qubit_by_current_square, entanglement, superposition,\
-            superposition_from
+        piece = self._crown_if_on_last_row(piece, move.to_index)
+
+        self.board.set_square(move.to_index, piece, ClassicalSquareState.QUANTUM)
+
+        # The merge can leave squares without any chance of the piece
+        self._prune_superposition(superposition)
+
+    def _prune_superposition(self, superposition: PieceSuperposition):
+        """Remove the squares the piece can no longer be on from the
+        superposition and the board. A piece that is left on one square
+        is no longer in superposition."""
+        state = self.get_quantum_state(superposition)
+        chances = state.chances(superposition.register)
+        dead_squares = [square for square in superposition.occupied_squares
+                        if chances.get(square, 0.0) < ZERO_CHANCE]
+        if not dead_squares:
+            return
+
+        for square in dead_squares:
+            superposition.occupied_squares.remove(square)
+            self.board.set_square(square, None, ClassicalSquareState.EMPTY)
+            if self.superposition_index.get(square) is superposition:
+                del self.superposition_index[square]
+        state.drop(dead_squares, superposition.register)
+
+        if len(superposition.occupied_squares) == 1 and\
+           self._find_entanglement(superposition) is None:
+            # The piece is certainly on the last square, which needs no
+            # measurement
+            self.board.set_occupancy(superposition.occupied_squares[0],
+                                     ClassicalSquareState.OCCUPIED)
+            self.superpositions.remove(superposition)
+            self._unindex_superposition(superposition)
+            self.quantum_hash ^= superposition.digest
 
     def measure(self, square_index: int) -> bool:
         """
@@ -450,75 +560,123 @@ class Game:
             return (self.board.classic_occupancy[square_index] == ClassicalSquareState.OCCUPIED,
                     False)
 
-        circuit, qubit_by_current_square, entanglement, superposition, superposition_from\
-            = self._get_circuit_for_square(square_index)
-
-        # Measure all qubits
-        circuit.append(cirq.measure(*qubit_by_current_square.values(), key="result"))
-
-        # Simulate the measurement
-        simulator = cirq.Simulator()
-        result = simulator.run(circuit)
+        self.version += 1
 
-        # Extract which qubit was measured as |1⟩ (occupied)
-        measurement = result.measurements["result"][0]
-
-        s = 0
-        square_found = {}
-        for square, qubit in qubit_by_current_square.items():
-            square = int(square.split('-')[1])
+        superposition = self._find_superposition_on_square(square_index)
+        entanglement = self._find_entanglement(superposition)
+        if self._outcome_path is None:
+            state = self.backend.build_state(self, superposition)
+            square_found = self.backend.sample(state)
+        else:
+            square_found = self._outcome_path.choose(self, superposition)
 
-            if measurement[list(qubit_by_current_square.values()).index(qubit)] == 1:
-                s += 1
-                square_found[square] = True
-            else:
-                if square not in square_found:
-                    square_found[square] = False
-        taken = s == 1 and entanglement is not None
+        superposition_from = None
+        if entanglement is not None:
+            superposition = entanglement.superposition_taken
+            superposition_from = entanglement.superposition_from
+        # Only the taker was found, so the take happened
+        taken = entanglement is not None and not any(
+            square_found[square] for square in superposition.occupied_squares)
 
         for square, found in square_found.items():
             if found:
-                self.board.classic_occupancy[square] = ClassicalSquareState.OCCUPIED
+                self.board.set_occupancy(square, ClassicalSquareState.OCCUPIED)
             else:
-                self.board.classic_occupancy[square] = ClassicalSquareState.EMPTY
-                self.board.piece_map[square] = None
+                self.board.set_square(square, None, ClassicalSquareState.EMPTY)
 
 
         # Remove the superposition
         self.superpositions.remove(superposition)
+        self._unindex_superposition(superposition)
+        self.quantum_hash ^= superposition.digest
 
         # Remove the entanglement if applicable
         if entanglement is not None:
             self.entanglements.remove(entanglement)
             self.superpositions.remove(superposition_from)
+            self._unindex_superposition(superposition_from)
+            self.quantum_hash ^= superposition_from.digest
+            del self.entanglement_index[superposition.uuid]
+            del self.entanglement_index[superposition_from.uuid]
 
         return square_found[square_index], taken
 
+    def outcome_distribution(self, move: Move) -> list[tuple[float, "Game"]]:
+        """Every position the move can lead to, with its probability.
+
+        Instead of sampling the measurements of a take, every collapse is
+        played out on its own clone of the game. Collapses that end in the
+        same position are combined. A move without measurements has a
+        single outcome with probability 1.
+        """
+        outcomes = {}
+        outcomes_cache = {}
+        pending = [()]
+        while pending:
+            outcome_path = OutcomePath(pending.pop(), outcomes_cache)
+            game = self.clone()
+            game._outcome_path = outcome_path
+            game.apply_move(move)
+            game._outcome_path = None
+
+            # Walk the other collapses of the measurements that were not
+            # fixed by the path
+            for depth in range(len(outcome_path.path), len(outcome_path.chosen)):
+                for index in range(1, outcome_path.counts[depth]):
+                    pending.append(
+                        tuple(outcome_path.chosen[:depth]) + (index,))
+
+            position_hash = game.get_position_hash()
+            if position_hash in outcomes:
+                probability, game = outcomes[position_hash]
+                outcomes[position_hash] = (
+                    probability + outcome_path.probability, game)
+            else:
+                outcomes[position_hash] = (outcome_path.probability, game)
+        return list(outcomes.values())
+
+    def get_quantum_state(self, superposition: PieceSuperposition):
+        if superposition.state is None:
+            entanglement = self._find_entanglement(superposition)
+            if entanglement is None:
+                superposition.state = SquareAmplitudes.from_moves(
+                    superposition.moves, superposition.moves_since_measure)
+                superposition.register = 0
+            else:
+                take_move = entanglement.superposition_from.moves[0]
+                entanglement.replay_state(self.board.geometry.get_jumped_over(
+                    take_move.from_index, take_move.to_index))
+        return superposition.state
+
     def get_all_chances(self):
+        return dict(self._cached("chances", self._get_all_chances))
+
+    def _get_all_chances(self):
         chances = {}
+        chance_cache = {}
         for i, occupancy in enumerate(self.board.classic_occupancy):
             if occupancy == ClassicalSquareState.QUANTUM\
                and i not in chances:
-                chances |= self._get_chances_for(i)
+                # Only simulate superpositions (or pairs) that changed
+                superposition = self._find_superposition_on_square(i)
+                entanglement = self._find_entanglement(superposition)
+                group = [superposition] if entanglement is None else\
+                    [entanglement.superposition_taken,
+                     entanglement.superposition_from]
+                digests = tuple(s.digest for s in group)
+
+                cached = self._chance_cache.get(superposition.uuid)
+                if cached is None or cached[0] != digests:
+                    cached = (digests, self._get_chances_for(i))
+                for s in group:
+                    chance_cache[s.uuid] = cached
+                chances |= cached[1]
+
+        # Drops the superpositions that are gone
+        self._chance_cache = chance_cache
         return chances
 
     def _get_chances_for(self, square_index):
-        circuit, qubit_by_current_square, entanglement, superposition, superposition_from\
-            = self._get_circuit_for_square(square_index)
-
-        simulator = cirq.Simulator()
-        squares = []
-        observables = []
-        for name, qubit in qubit_by_current_square.items():
-            square = int(name.split('-')[1])
-            squares.append(square)
-            observables.append(cirq.Z(qubit))
-
-        ev_list = simulator.simulate_expectation_values(
-            circuit, observables=observables)
-        for i in range(len(ev_list)):
-            # Convert from Z eigenvalues (-1, 1) to chance of |1>
-            ev_list[i] = abs((1 - ev_list[i]) / 2.0)
-
-        return dict(zip(squares, ev_list))
-
+        superposition = self._find_superposition_on_square(square_index)
+        return self.backend.marginals(
+            self.backend.build_state(self, superposition))
@@ -22,66 +22,203 @@ from uuid import UUID
 from game import Game
 from enums import GameType, ClassicalSquareState, PieceColor, GameState
 from piece import Piece
-from moves import ClassicalMove, SplitMove, MergeMove
+from moves import Move, ClassicalMove, SplitMove, MergeMove
 from quantum_state import PieceSuperposition, PieceEntanglement
+from amplitudes import SquareAmplitudes, PairAmplitudes
+
+
+class PieceObject(BaseModel):
+    color: PieceColor
+    crowned: bool
+    moves_since_measure: int = 0
+
+    @staticmethod
+    def from_piece(piece: Optional[Piece]):
+        if piece is None:
+            return None
+        return PieceObject(color=piece.color, crowned=piece.crowned,
+                           moves_since_measure=piece.moves_since_measure)
+
+    def to_piece(self):
+        return Piece(color=self.color, crowned=self.crowned,
+                     moves_since_measure=self.moves_since_measure)
+
+
+class ClassicalMoveObject(BaseModel):
+    is_take_move: bool
+    from_index: int
+    to_index: int
+
+
+class SplitMoveObject(BaseModel):
+    is_take_move: bool
+    from_index: int
+    to_index1: int
+    to_index2: int
+
+
+class MergeMoveObject(BaseModel):
+    is_take_move: bool
+    from_index1: int
+    from_index2: int
+    to_index: int
+
+
+MoveObject = Union[ClassicalMoveObject, SplitMoveObject, MergeMoveObject]
+
+_move_object_types = {
+    ClassicalMove: ClassicalMoveObject,
+    SplitMove: SplitMoveObject,
+    MergeMove: MergeMoveObject,
+}
+_move_types = {v: k for k, v in _move_object_types.items()}
+
+
+def move_to_object(move: Optional[Move]) -> Optional[MoveObject]:
+    if move is None:
+        return None
+    fields = {field: getattr(move, field) for field in move.__slots__}
+    return _move_object_types[type(move)](
+        is_take_move=move.is_take_move, **fields)
+
+
+def object_to_move(move_object: Optional[MoveObject]) -> Optional[Move]:
+    if move_object is None:
+        return None
+    return _move_types[type(move_object)](**move_object.model_dump())
+
+
+class AmplitudeObject(BaseModel):
+    # One square per piece, None when an entangled piece was taken
+    squares: list[Optional[int]]
+    real: float
+    imag: float
+
+
+def state_to_objects(state) -> Optional[list[AmplitudeObject]]:
+    if state is None:
+        return None
+    return [AmplitudeObject(
+                squares=list(key) if isinstance(key, tuple) else [key],
+                real=amplitude.real, imag=amplitude.imag)
+            for key, amplitude in state.amplitudes.items()]
+
+
+def objects_to_state(amplitude_objects: Optional[list[AmplitudeObject]],
+                     entangled: bool):
+    if amplitude_objects is None:
+        return None
+    state_type = PairAmplitudes if entangled else SquareAmplitudes
+    state = state_type.__new__(state_type)
+    state.amplitudes = {
+        tuple(a.squares) if entangled else a.squares[0]:
+        complex(a.real, a.imag)
+        for a in amplitude_objects}
+    return state
+
+
+class PieceSuperpositionObject(BaseModel):
+    uuid: UUID
+    occupied_squares: list[int]
+    moves: list[Optional[MoveObject]]
+    moves_since_measure: int
+    # Optional, without it the state is computed from the moves
+    state: Optional[list[AmplitudeObject]] = None
+    state_register: int = 0
+
+    @staticmethod
+    def from_superposition(superposition: PieceSuperposition,
+                           include_state: bool = False):
+        return PieceSuperpositionObject(
+            uuid=superposition.uuid,
+            occupied_squares=superposition.occupied_squares,
+            moves=[move_to_object(m) for m in superposition.moves],
+            moves_since_measure=superposition.moves_since_measure,
+            state=state_to_objects(superposition.state)
+            if include_state else None,
+            state_register=superposition.register)
+
+    def to_superposition(self, entangled: bool = False):
+        return PieceSuperposition(
+            uuid=self.uuid,
+            occupied_squares=list(self.occupied_squares),
+            moves=[object_to_move(m) for m in self.moves],
+            moves_since_measure=self.moves_since_measure,
+            state=objects_to_state(self.state, entangled),
+            register=self.state_register)
 
 
 class GameStateObject(BaseModel):
     # Board properties
     board_size: int
-    piece_map: list[Optional[Piece]]
+    piece_map: list[Optional[PieceObject]]
     classic_occupancy: list[ClassicalSquareState]
 
     # Game properies
     game_type: GameType
-    moves: list[Union[ClassicalMove, SplitMove, MergeMove]]
+    moves: list[MoveObject]
     turn: PieceColor
     moves_since_take: int
-    superpositions: list[PieceSuperposition]
+    superpositions: list[PieceSuperpositionObject]
     entanglements: list[Tuple[UUID, UUID]]
 
     # Extra's
-    possible_moves: list[Union[ClassicalMove, SplitMove, MergeMove]]
+    possible_moves: list[MoveObject]
     chances: Dict[int, float]
     game_state: GameState
 
+    # Tells the games of the api apart, handed out by /start
+    game_id: Optional[UUID] = None
+
     @staticmethod
-    def from_game(game: Game):
+    def from_game(game: Game, include_quantum_state: bool = False,
+                  game_id: Optional[UUID] = None):
         entanglements = [
             (e.superposition_taken.uuid, e.superposition_from.uuid)
             for e in game.entanglements]
         return GameStateObject(
             board_size=game.board.size,
-            piece_map=game.board.piece_map,
+            piece_map=[PieceObject.from_piece(p) for p in game.board.piece_map],
             classic_occupancy=game.board.classic_occupancy,
             game_type=game.game_type,
-            moves=game.moves,
+            moves=[move_to_object(m) for m in game.moves],
             turn=game.turn,
             moves_since_take=game.moves_since_take,
-            superpositions=game.superpositions,
+            superpositions=[
+                PieceSuperpositionObject.from_superposition(
+                    s, include_quantum_state)
+                for s in game.superpositions],
             entanglements=entanglements,
-            possible_moves=game.board.get_possible_moves(
-                game.turn, game.superpositions),
+            possible_moves=[move_to_object(m)
+                            for m in game.get_possible_moves()],
             chances=game.get_all_chances(),
-            game_state=game.get_game_state())
+            game_state=game.get_game_state(),
+            game_id=game_id)
 
     def to_game(self):
         game = Game(
             self.board_size,
             start_rows=0,  # Overriden by piece maps
             game_type=self.game_type)
-        game.board.piece_map = self.piece_map
-        game.board.classic_occupancy = self.classic_occupancy
-        game.moves = self.moves
+        game.board.piece_map = [p.to_piece() if p is not None else None
+                                for p in self.piece_map]
+        game.board.classic_occupancy = list(self.classic_occupancy)
+        game.moves = [object_to_move(m) for m in self.moves]
         game.turn = self.turn
         game.moves_since_take = self.moves_since_take
-        game.superpositions = self.superpositions
+        entangled = {uuid for pair in self.entanglements for uuid in pair}
+        game.superpositions = [s.to_superposition(s.uuid in entangled)
+                               for s in self.superpositions]
+        superpositions_by_uuid = {s.uuid: s for s in game.superpositions}
         real_entanglements = []
         for t, f in self.entanglements:
-            real_entanglements.append(PieceEntanglement(
-                superposition_from=next((s for s in self.superpositions
-                                         if s.uuid == f), None),
-                superposition_taken=next((s for s in self.superpositions
-                                          if s.uuid == t), None)))
+            entanglement = PieceEntanglement(
+                superposition_from=superpositions_by_uuid.get(f),
+                superposition_taken=superpositions_by_uuid.get(t))
+            if entanglement.superposition_taken.state is not None:
+                # Both pieces of the pair share one state
+                entanglement.set_state(entanglement.superposition_taken.state)
+            real_entanglements.append(entanglement)
         game.entanglements = real_entanglements
+        game.refresh()
         return game
@@ -0,0 +1,116 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+from functools import lru_cache
+
+from enums import PieceColor
+
+
+class BoardGeometry:
+    """Precomputed square tables for one board size.
+
+    The tables only depend on the size of the board, so they are built
+    once and shared by every `Board` of that size. They must never be
+    modified.
+
+    Per color (indexed by `PieceColor.value`) and square index there is
+    a tuple of (neighbour, landing) steps, in the order in which moves
+    are generated. The landing square is the one reached when jumping
+    over the neighbour, or None when that is off the board.
+    """
+    size: int
+    num_squares: int
+    xy_index_map: dict
+    index_xy_map: dict
+    rows: list[int]
+    forward_steps: list[list[tuple]]
+    backward_steps: list[list[tuple]]
+    crowned_steps: list[list[tuple]]
+    crowning: list[list[bool]]
+    jumped_over: list
+    influence: list[tuple]
+
+    def __init__(self, size):
+        self.size = size
+        self.xy_index_map = {}
+        self.index_xy_map = {}
+
+        i = 0
+        for y in range(size):
+            for x in range(size):
+                if (x+y) % 2 == 1:
+                    continue  # White square, not used
+                self.xy_index_map[(x, y)] = i
+                self.index_xy_map[i] = (x, y)
+                i += 1
+        self.num_squares = i
+
+        self.rows = [self.index_xy_map[i][1] for i in range(self.num_squares)]
+
+        self.forward_steps = []
+        self.backward_steps = []
+        self.crowned_steps = []
+        self.crowning = []
+        for color in PieceColor:
+            standard_dir = 1 if color == PieceColor.WHITE else -1
+            last_row = size - 1 if color == PieceColor.WHITE else 0
+            forward = [self._steps(i, standard_dir)
+                       for i in range(self.num_squares)]
+            backward = [self._steps(i, -standard_dir)
+                        for i in range(self.num_squares)]
+            self.forward_steps.append(forward)
+            self.backward_steps.append(backward)
+            self.crowned_steps.append([f + b for f, b in zip(forward, backward)])
+            self.crowning.append([row == last_row for row in self.rows])
+
+        # The square in between for every (from, to) pair of a jump,
+        # stored flat at from * num_squares + to.
+        self.jumped_over = [None] * (self.num_squares * self.num_squares)
+        for i in range(self.num_squares):
+            for neighbour, landing in self.crowned_steps[0][i]:
+                if landing is not None:
+                    self.jumped_over[i * self.num_squares + landing] = neighbour
+
+        # The squares whose moves can change when the given square changes:
+        # the square itself and every square that can step or jump to it
+        # or over it.
+        influenced = [{i} for i in range(self.num_squares)]
+        for i in range(self.num_squares):
+            for neighbour, landing in self.crowned_steps[0][i]:
+                influenced[neighbour].add(i)
+                if landing is not None:
+                    influenced[landing].add(i)
+        self.influence = [tuple(sorted(s)) for s in influenced]
+
+    def _steps(self, index, dy):
+        x, y = self.index_xy_map[index]
+        steps = []
+        for dx in [-1, 1]:
+            neighbour = self.xy_index_map.get((x + dx, y + dy))
+            if neighbour is None:
+                continue
+            landing = self.xy_index_map.get((x + 2 * dx, y + 2 * dy))
+            steps.append((neighbour, landing))
+        return tuple(steps)
+
+    def get_jumped_over(self, from_index, to_index):
+        return self.jumped_over[from_index * self.num_squares + to_index]
+
+
+@lru_cache(maxsize=None)
+def get_geometry(size) -> BoardGeometry:
+    return BoardGeometry(size)
@@ -0,0 +1,111 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+from enums import GameType, PieceColor
+from board import Board
+
+
+class LegalMoves:
+    """Keeps the classical moves of every piece on a board up to date.
+
+    The board records which squares were written through
+    `Board.set_square`, and only the moves of the pieces near those
+    squares are generated again. Combining them into the moves for one
+    side then no longer needs to look at the board.
+    """
+    board: Board
+    simple_moves: list[list]
+    take_moves: list[list]
+    take_counts: list[int]
+
+    def __init__(self, board: Board):
+        self.board = board
+        num_squares = board.geometry.num_squares
+        self.simple_moves = [[] for _ in range(num_squares)]
+        self.take_moves = [[] for _ in range(num_squares)]
+        self.take_counts = [0 for _ in PieceColor]
+        self.colors = [None] * num_squares
+
+        board.changed_squares.clear()
+        self._update(range(num_squares))
+
+    def clone(self, board: Board):
+        """Copy of the tracker that follows the given copy of the board."""
+        legal_moves = LegalMoves.__new__(LegalMoves)
+        legal_moves.board = board
+        # The move lists per square are replaced, never changed in place
+        legal_moves.simple_moves = self.simple_moves.copy()
+        legal_moves.take_moves = self.take_moves.copy()
+        legal_moves.take_counts = self.take_counts.copy()
+        legal_moves.colors = self.colors.copy()
+        return legal_moves
+
+    def _sync(self):
+        if self.board.changed_squares:
+            self._update(self.board.changed_squares)
+            self.board.changed_squares.clear()
+
+    def _update(self, changed_squares):
+        influence = self.board.geometry.influence
+        squares = set()
+        for square in changed_squares:
+            squares.update(influence[square])
+
+        for square in squares:
+            old_color = self.colors[square]
+            if old_color is not None:
+                self.take_counts[old_color] -= len(self.take_moves[square])
+
+            simple_moves, take_moves = self.board.get_square_moves(square)
+            color = None
+            if simple_moves or take_moves:
+                color = self.board.piece_map[square].color.value
+                self.take_counts[color] += len(take_moves)
+
+            self.simple_moves[square] = simple_moves
+            self.take_moves[square] = take_moves
+            self.colors[square] = color
+
+    def get_take_moves(self, color: PieceColor):
+        self._sync()
+        if self.take_counts[color.value] == 0:
+            return []
+        return [move
+                for square, moves in enumerate(self.take_moves)
+                if self.colors[square] == color.value
+                for move in moves]
+
+    def get_possible_moves(self, color: PieceColor, superpositions=None,
+                           superposition_index=None):
+        take_moves = self.get_take_moves(color)
+        if len(take_moves) > 0:
+            return take_moves
+
+        moves = [move
+                 for square, moves in enumerate(self.simple_moves)
+                 if self.colors[square] == color.value
+                 for move in moves]
+        if self.board.game_type == GameType.CLASSIC:
+            return moves
+        moves += self.board.find_split_and_merge_moves(
+            moves, superpositions, superposition_index)
+        return self.board.filter_for_game_type(moves)
+
+    def has_take_move(self, square):
+        """Whether the piece on the square can take, used for multi-jumps."""
+        self._sync()
+        return len(self.take_moves[square]) > 0
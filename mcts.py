@@ -16,18 +16,24 @@
 # You should have received a copy of the GNU Affero General Public
 # License along with Cheqqers. If not, see
 # <https://www.gnu.org/licenses/>.
-import numpy as np
+import atexit
 import math
+import multiprocessing
 import random
-from copy import deepcopy
+import threading
+import time
 import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
 
 from enums import GameState, PieceColor
 
 
 class RandomBot:
     def select_move(self, game):
-        possible_moves = game.board.get_possible_moves(game.turn, game.superpositions)
+        possible_moves = game.get_possible_moves()
         try:
             if len(possible_moves) == 1:
                 return possible_moves[0]
@@ -38,6 +44,164 @@ class RandomBot:
             return None  # Safe fallback
 
 
+def rollout(game, rollout_limit):
+    """Play random moves from the position of the game. Returns 1 when the
+    player to move loses, 0 when they win and 0.5 for a draw."""
+    try:
+        sim_game = game.clone()
+        rollout_color = sim_game.turn
+
+        p1, p2 = RandomBot(), RandomBot()
+        counter = 0
+
+        while sim_game.get_game_state() == GameState.IN_PROGRESS and counter < rollout_limit:
+            selected_move = p1.select_move(sim_game) if sim_game.turn == PieceColor.WHITE else p2.select_move(sim_game)
+            sim_game.apply_move(selected_move)
+            counter += 1
+
+        result = sim_game.get_game_state()
+        if result == GameState.DRAW:
+            return 0.5
+        return 1 if (result == GameState.WHITE_WON and rollout_color == PieceColor.BLACK) or (result == GameState.BLACK_WON and rollout_color == PieceColor.WHITE) else 0
+    except Exception as e:
+        print(f"There was some error {e} while simulating MCTS")
+        return 0.5  # Ignore errors
+
+
+def _rollout_task(game, rollout_limit, seed):
+    random.seed(seed)
+    return rollout(game, rollout_limit)
+
+
+class NodeStats:
+    """Visit count and value sum of a position, shared by all nodes that
+    reach it when a transposition table is used.
+
+    The visits also count the virtual losses of rollouts that are still
+    running, of which there are `virtual_visits`.
+    """
+    __slots__ = ("visit_count", "value_sum", "virtual_visits")
+
+    def __init__(self):
+        self.visit_count = 0
+        self.value_sum = 0
+        self.virtual_visits = 0
+
+
+class TranspositionTable:
+    """Bounded map from position hash to `NodeStats`.
+
+    When it is full the least recently used position is dropped. Nodes
+    that still refer to its stats keep them, they are just no longer
+    shared with new nodes.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        stats = self.entries.get(key)
+        if stats is None:
+            stats = NodeStats()
+            self.entries[key] = stats
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return stats
+
+
+# The worker processes, one pool per number of workers. They are shared
+# by all searches and started on first use.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _warm_up():
+    import game  # noqa: F401
+
+
+def _get_pool(num_workers):
+    with _pools_lock:
+        pool = _pools.get(num_workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(
+                num_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_up)
+            _pools[num_workers] = pool
+        return pool
+
+
+@atexit.register
+def _shutdown_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown()
+        _pools.clear()
+
+
+# The searches of a worker process by the id of the search that sent them
+# and its args, kept between tasks so that their trees and transposition
+# tables are reused. A worker serves many searches, so only the most
+# recently used ones are kept.
+_worker_mcts = OrderedDict()
+_MAX_WORKER_MCTS = 64
+
+
+def _search_root_visits(search_id, game, args, goal_state, seed, deadline,
+                        num_searches):
+    """Search in a worker process, returns the visits per root move."""
+    key = (search_id, tuple(sorted(args.items())))
+    mcts = _worker_mcts.get(key)
+    if mcts is None:
+        mcts = MCTS(args, goal_state)
+        _worker_mcts[key] = mcts
+        if len(_worker_mcts) > _MAX_WORKER_MCTS:
+            _worker_mcts.popitem(last=False)
+    else:
+        _worker_mcts.move_to_end(key)
+    random.seed(seed)
+    mcts.search(game, num_searches=num_searches, deadline=deadline)
+    return {child.move: child.visit_count for child in mcts.root.children}
+
+
+class SearchBudget:
+    """Number of iterations and/or wall clock time a search may take.
+
+    At least one iteration is always allowed, so that there is a move to
+    choose. The deadline is a `time.perf_counter` time, which is the same
+    clock in every process of the machine.
+    """
+    num_searches: Optional[int]
+    deadline: Optional[float]
+    done: int
+
+    def __init__(self, time_limit=None, num_searches=None, deadline=None):
+        if time_limit is None and num_searches is None and deadline is None:
+            raise ValueError("A search needs a time limit or a number of searches")
+        self.num_searches = num_searches
+        self.deadline = deadline
+        if time_limit is not None:
+            end = time.perf_counter() + time_limit
+            self.deadline = end if deadline is None else min(deadline, end)
+        self.done = 0
+
+    def next(self) -> bool:
+        """Whether another iteration fits, it is counted when it does."""
+        if self.done > 0 and (
+                (self.num_searches is not None
+                 and self.done >= self.num_searches) or
+                (self.deadline is not None
+                 and time.perf_counter() >= self.deadline)):
+            return False
+        self.done += 1
+        return True
+
+
 class MCTS:
     goal_state: GameState
 
@@ -45,17 +209,66 @@ class MCTS:
         self.args = args
         self.goal_state = goal_state
 
-    def search(self, game):
-        self.game = deepcopy(game)
+        # Optional, shared between searches since the stats of a position
+        # stay valid
+        self.transpositions = None
+        table_size = args.get("transposition_table_size", 0)
+        if table_size > 0:
+            self.transpositions = TranspositionTable(table_size)
+
+        # The tree of the last search, searched further from the position
+        # that was actually reached when "reuse_tree" is set
+        self.root = None
+
+        # With more than one worker the searches run in the shared worker
+        # processes, which keep a tree per search id
+        self.num_workers = args.get("num_workers", 1)
+        self.search_id = uuid.uuid4()
+        self.root_visits = {}
+        self.worker_visits = []
+
+        # Same for the rollouts, with more than one rollout worker
+        self.rollout_workers = args.get("rollout_workers", 1)
+
+    def search(self, game, time_limit=None, num_searches=None, deadline=None):
+        """The best move found within the budget: num_searches iterations
+        and/or time_limit seconds or until the perf_counter deadline,
+        whichever runs out first. When none is given, "num_searches" and
+        "time_limit" from the args are used."""
+        if time_limit is None and num_searches is None and deadline is None:
+            time_limit = self.args.get("time_limit")
+            num_searches = self.args.get("num_searches")
+        budget = SearchBudget(time_limit, num_searches, deadline)
+
+        if self.num_workers > 1:
+            return self.parallel_search(game, budget)
+
         self.root_color = game.turn
-        self.root = Node(self.game, self.args, self.root_color)
+        root = None
+        if self.args.get("reuse_tree", False):
+            root = self.find_node(game)
+        if root is None:
+            self.game = game.clone()
+            self.root = Node(self.game, self.args, self.root_color,
+                             transpositions=self.transpositions)
+        else:
+            # Drop the rest of the old tree
+            root.parent = None
+            self.game = root.game
+            self.root = root
 
-        possible_moves = self.game.board.get_possible_moves(self.game.turn, self.game.superpositions)
+        possible_moves = self.game.get_possible_moves()
 
         if len(possible_moves) == 1:
             return possible_moves[0]
 
-        for _ in range(self.args["num_searches"]):
+        if self.rollout_workers > 1:
+            self.batched_search(budget)
+            best_child = max(self.root.children,
+                             key=lambda child: child.visit_count)
+            return best_child.move
+
+        while budget.next():
             # Start from the root
             node = self.root
 
@@ -72,32 +285,150 @@ class MCTS:
             else:
                 # Expand all children
                 for child in node.expand():
+                    if child.visit_count > 0:
+                        # A transposition of a position that was already
+                        # searched, reuse its value instead of a rollout
+                        value = child.value_sum / child.visit_count
+                        child.parent.backpropagate(
+                            child.adjust_for_parent(value))
+                        continue
                     value = sum(child.simulate() for _ in range(self.args["num_simulations"]) )
                     child.backpropagate(value)
 
-        action_probs = np.array([child.visit_count for child in self.root.children])
-        return self.root.children[np.argmax(action_probs)].move
+        best_child = max(self.root.children, key=lambda child: child.visit_count)
+        return best_child.move
+
+    def batched_search(self, budget: SearchBudget):
+        """Leaf parallel search from the root. Leaves are chosen in batches
+        with a virtual loss on their path, so that a batch spreads over the
+        tree, and all their rollouts run at once in the rollout workers."""
+        pool = _get_pool(self.rollout_workers)
+        batch_size = self.args.get("rollout_batch_size", self.rollout_workers)
+        rollout_limit = self.args.get("rollout", 100)
+
+        more = True
+        while more:
+            running = []
+            for _ in range(batch_size):
+                more = budget.next()
+                if not more:
+                    break
+                node = self.root
+                while node.is_fully_expanded():
+                    node = node.select()
+
+                result = node.game.get_game_state()
+                if result != GameState.IN_PROGRESS:
+                    value = 0.5 if result == GameState.DRAW else 1
+                    node.backpropagate(value)
+                    continue
+
+                for child in node.expand():
+                    if child.visit_count > child.stats.virtual_visits:
+                        value = child.value_sum / child.visit_count
+                        child.parent.backpropagate(
+                            child.adjust_for_parent(value))
+                        continue
+                    child.add_virtual_loss()
+                    futures = [
+                        pool.submit(
+                            _rollout_task, child.game, rollout_limit,
+                            random.getrandbits(64))
+                        for _ in range(self.args["num_simulations"])]
+                    running.append((child, futures))
+
+            for child, futures in running:
+                value = sum(future.result() for future in futures)
+                child.remove_virtual_loss()
+                child.backpropagate(value)
+
+    def parallel_search(self, game, budget: SearchBudget):
+        """Root parallel search: every worker searches its share of the
+        iterations, until the same deadline, from the same position with
+        its own seed. The move with the most visits over all workers is
+        chosen."""
+        possible_moves = game.get_possible_moves()
+        if len(possible_moves) == 1:
+            return possible_moves[0]
+
+        pool = _get_pool(self.num_workers)
+        worker_args = dict(self.args, num_workers=1, rollout_workers=1)
+        num_searches = None
+        if budget.num_searches is not None:
+            num_searches = math.ceil(budget.num_searches / self.num_workers)
+        game = game.clone()
+        # Workers may start late when the pool is busy, so they get the
+        # deadline rather than the time that is left now
+        futures = [pool.submit(_search_root_visits, self.search_id, game,
+                               worker_args, self.goal_state,
+                               random.getrandbits(64), budget.deadline,
+                               num_searches)
+                   for _ in range(self.num_workers)]
+
+        # Kept for inspection, there is no tree in this process
+        self.worker_visits = [future.result() for future in futures]
+        visits = {}
+        for worker_visits in self.worker_visits:
+            for move, visit_count in worker_visits.items():
+                visits[move] = visits.get(move, 0) + visit_count
+        self.root_visits = visits
+        return max(possible_moves, key=lambda move: visits.get(move, 0))
+
+    def find_node(self, game):
+        """The node of the last tree with the position of the game, or None
+        when the tree never reached it (also when a measurement turned
+        out differently than it did in the tree)."""
+        if self.root is None:
+            return None
+        position_hash = game.get_position_hash()
+        nodes = [self.root]
+        for node in nodes:
+            if node.game.get_position_hash() == position_hash:
+                # The hash covers the rules, but a collision must not
+                # make the search play moves that are not legal
+                if node.game.game_type != game.game_type\
+                        or node.game.allow_draws != game.allow_draws\
+                        or node.game.get_possible_moves()\
+                        != game.get_possible_moves():
+                    return None
+                return node
+            nodes.extend(node.children)
+        return None
 
 
 class Node:
-    def __init__(self, game, args, root_color, move=None, parent=None, weight=1):
-        self.game = deepcopy(game)
+    def __init__(self, game, args, root_color, move=None, parent=None, weight=1,
+                 transpositions=None, expandable_moves=None):
+        self.game = game
         self.args = args
         self.move = move
         self.root_color = root_color 
         self.parent = parent
         self.weight = weight
         self.children = []
-        self.expandable_moves = self.game.board.get_possible_moves(self.game.turn, self.game.superpositions)
-        self.visit_count = 0
-        self.value_sum = 0
+        if expandable_moves is None:
+            expandable_moves = self.game.get_possible_moves()
+        self.expandable_moves = expandable_moves
+        self.transpositions = transpositions
+        if transpositions is not None:
+            self.stats = transpositions.get(game.get_position_hash())
+        else:
+            self.stats = NodeStats()
+
+    @property
+    def visit_count(self):
+        return self.stats.visit_count
+
+    @property
+    def value_sum(self):
+        return self.stats.value_sum
 
     def is_fully_expanded(self):
         return len(self.expandable_moves) == 0 and len(self.children) > 0
 
     def select(self):
         best_children = []
-        best_ucb = -np.inf
+        best_ucb = -math.inf
         for child in self.children:
             ucb = self.get_ucb(child)
             if ucb > best_ucb:
@@ -120,39 +451,98 @@ class Node:
         action = random.choice(self.expandable_moves)
         self.expandable_moves.remove(action)
 
-        new_game = deepcopy(self.game)
-        new_game.apply_move(action)
+        if self.args.get("chance_nodes", False):
+            distribution = self.game.outcome_distribution(action)
+        else:
+            new_game = self.game.clone()
+            new_game.apply_move(action)
+            distribution = [(1.0, new_game)]
 
-        child = Node(new_game, self.args, self.root_color, action, self, 1)
+        if len(distribution) > 1:
+            # The move measures, every outcome gets a rollout
+            chance = ChanceNode(self.game, self.args, self.root_color, action,
+                                self, distribution, self.transpositions)
+            self.children.append(chance)
+            return chance.children
+
+        child = Node(distribution[0][1], self.args, self.root_color, action,
+                     self, 1, self.transpositions)
         self.children.append(child)
         return [child]
 
     def simulate(self):
-        try:
-            sim_game = deepcopy(self.game)
-            rollout_limit = self.args.get("rollout", 100)
-            rollout_color = sim_game.turn
-
-            p1, p2 = RandomBot(), RandomBot()
-            counter = 0
-
-            while sim_game.get_game_state() == GameState.IN_PROGRESS and counter < rollout_limit:
-                selected_move = p1.select_move(sim_game) if sim_game.turn == PieceColor.WHITE else p2.select_move(sim_game)
-                sim_game.apply_move(selected_move)
-                counter += 1
-
-            result = sim_game.get_game_state()
-            if result == GameState.DRAW:
-                return 0.5
-            return 1 if (result == GameState.WHITE_WON and rollout_color == PieceColor.BLACK) or (result == GameState.BLACK_WON and rollout_color == PieceColor.WHITE) else 0
-        except Exception as e:
-            print(f"There was some error {e} while simulating MCTS")
-            return 0.5  # Ignore errors
+        return rollout(self.game, self.args.get("rollout", 100))
+
+    def adjust_for_parent(self, value):
+        return 1 - value if self.parent.game.turn != self.game.turn else value
+
+    def _virtual_loss(self):
+        # The value that `select` of the parent sees as a loss
+        return 0 if self.parent is None else self.adjust_for_parent(1)
+
+    def add_virtual_loss(self):
+        """Count a visit that is lost for everyone choosing the path to
+        this node, until its rollouts return."""
+        node = self
+        while node is not None:
+            node.stats.visit_count += 1
+            node.stats.virtual_visits += 1
+            node.stats.value_sum += node._virtual_loss()
+            node = node.parent
+
+    def remove_virtual_loss(self):
+        node = self
+        while node is not None:
+            node.stats.visit_count -= 1
+            node.stats.virtual_visits -= 1
+            node.stats.value_sum -= node._virtual_loss()
+            node = node.parent
 
     def backpropagate(self, value):
-        self.value_sum += value
-        self.visit_count += 1
+        self.stats.value_sum += value
+        self.stats.visit_count += 1
 
         if self.parent:
-            adjusted_value = 1 - value if self.parent.game.turn != self.game.turn else value
-            self.parent.backpropagate(adjusted_value)
+            self.parent.backpropagate(self.adjust_for_parent(value))
+
+
+class ChanceNode(Node):
+    """A move that measures. Its children are the positions after each
+    outcome, with the probability of the outcome as their weight.
+
+    The value is the expectation over the outcomes that were searched,
+    instead of the mean over whichever outcomes happened to be sampled.
+    It has the game of the parent, so it passes values on unchanged.
+    """
+    def __init__(self, game, args, root_color, move, parent, distribution,
+                 transpositions=None):
+        # Without transpositions, as the position is the one of the parent.
+        # All outcomes are there from the start, so nothing to expand.
+        super().__init__(game, args, root_color, move, parent,
+                         expandable_moves=[])
+        self.transpositions = transpositions
+        self.children = [Node(outcome, args, root_color, move, self,
+                              probability, transpositions)
+                         for probability, outcome in distribution]
+
+    @property
+    def value_sum(self):
+        expectation = 0
+        searched = 0
+        for child in self.children:
+            if child.visit_count > 0:
+                value = child.value_sum / child.visit_count
+                expectation += child.weight * child.adjust_for_parent(value)
+                searched += child.weight
+        if searched > 0:
+            expectation /= searched
+        visits = self.stats.visit_count - self.stats.virtual_visits
+        return visits * expectation\
+            + self.stats.virtual_visits * self._virtual_loss()
+
+    def is_fully_expanded(self):
+        return True
+
+    def select(self):
+        return random.choices(
+            self.children, weights=[child.weight for child in self.children])[0]
@@ -15,28 +15,82 @@
 # You should have received a copy of the GNU Affero General Public
 # License along with Cheqqers. If not, see
 # <https://www.gnu.org/licenses/>.
-from pydantic import BaseModel
 
 
-class Move(BaseModel):
+class Move:
+    """A move as used by the game engine.
+
+    Moves are generated and copied a lot during search, so they are small
+    immutable values instead of pydantic models. The models used for the
+    API live in `game_state_object`.
+    """
+    __slots__ = ("is_take_move",)
     is_take_move: bool
 
     def print_move(self):
         return "TODO"
 
+    def _key(self):
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and\
+            self.is_take_move == other.is_take_move and\
+            self._key() == other._key()
+
+    def __hash__(self):
+        return hash((type(self).__name__, self.is_take_move, self._key()))
+
+    def __repr__(self):
+        fields = [("is_take_move", self.is_take_move)] +\
+            [(field, getattr(self, field)) for field in self.__slots__]
+        return f"{type(self).__name__}(" +\
+            ", ".join(f"{name}={value!r}" for name, value in fields) + ")"
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (type(self), (self.is_take_move,) + self._key())
+
 
 class ClassicalMove(Move):
+    __slots__ = ("from_index", "to_index")
     from_index: int
     to_index: int
 
+    def __init__(self, is_take_move: bool, from_index: int, to_index: int):
+        self.is_take_move = is_take_move
+        self.from_index = from_index
+        self.to_index = to_index
+
 
 class SplitMove(Move):
+    __slots__ = ("from_index", "to_index1", "to_index2")
     from_index: int
     to_index1: int
     to_index2: int
 
+    def __init__(self, is_take_move: bool, from_index: int,
+                 to_index1: int, to_index2: int):
+        self.is_take_move = is_take_move
+        self.from_index = from_index
+        self.to_index1 = to_index1
+        self.to_index2 = to_index2
+
 
 class MergeMove(Move):
+    __slots__ = ("from_index1", "from_index2", "to_index")
     from_index1: int
     from_index2: int
     to_index: int
+
+    def __init__(self, is_take_move: bool, from_index1: int,
+                 from_index2: int, to_index: int):
+        self.is_take_move = is_take_move
+        self.from_index1 = from_index1
+        self.from_index2 = from_index2
+        self.to_index = to_index
@@ -15,21 +15,78 @@
 # You should have received a copy of the GNU Affero General Public
 # License along with Cheqqers. If not, see
 # <https://www.gnu.org/licenses/>.
-from pydantic import BaseModel
-import copy
-
 from enums import PieceColor
 
 
-class Piece(BaseModel):
+class Piece:
+    """A piece on the board.
+
+    Pieces are immutable and interned: there is exactly one instance for
+    every combination of color, crown and phase, identified by a small
+    integer code. Only the phase modulo 4 matters (it is the power of
+    the S gate), so that is all that is stored in moves_since_measure.
+    Applying a phase or crowning a piece is a table lookup, and copying
+    a board only copies references.
+    """
+    __slots__ = ("color", "crowned", "moves_since_measure", "code")
     color: PieceColor
     crowned: bool
-    moves_since_measure: int = 0
+    moves_since_measure: int
+    code: int
+
+    # All pieces, and the result of applying a phase to them or crowning
+    # them, indexed by their code
+    _pieces = []
+    _phased = []
+    _crowned = []
+
+    def __new__(cls, color: PieceColor, crowned: bool,
+                moves_since_measure: int = 0):
+        return cls._pieces[Piece.encode(color, crowned, moves_since_measure)]
+
+    @staticmethod
+    def encode(color: PieceColor, crowned: bool, moves_since_measure: int):
+        return color.value | int(crowned) << 1 | (moves_since_measure % 4) << 2
+
+    @staticmethod
+    def from_code(code: int):
+        return Piece._pieces[code]
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Pieces are immutable")
+
+    def __repr__(self):
+        return f"Piece(color={self.color}, crowned={self.crowned}, " +\
+            f"moves_since_measure={self.moves_since_measure})"
+
+    def __reduce__(self):
+        return (Piece.from_code, (self.code,))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def copy(self):
-        return copy.deepcopy(self)
+        return self
 
     def apply_phase(self):
-        n = self.copy()
-        n.moves_since_measure += 1
-        return n
+        return Piece._phased[self.code]
+
+    def crown(self):
+        return Piece._crowned[self.code]
+
+
+for _code in range(16):
+    _piece = object.__new__(Piece)
+    object.__setattr__(_piece, "color", PieceColor(_code & 1))
+    object.__setattr__(_piece, "crowned", bool(_code & 0b10))
+    object.__setattr__(_piece, "moves_since_measure", _code >> 2)
+    object.__setattr__(_piece, "code", _code)
+    Piece._pieces.append(_piece)
+for _piece in Piece._pieces:
+    Piece._phased.append(Piece(_piece.color, _piece.crowned,
+                               _piece.moves_since_measure + 1))
+    Piece._crowned.append(Piece(_piece.color, True,
+                                _piece.moves_since_measure))
@@ -16,6 +16,7 @@
 # License along with Cheqqers. If not, see
 # <https://www.gnu.org/licenses/>.
 import random
+from typing import Optional
 
 from enums import GameState
 from moves import ClassicalMove, SplitMove, MergeMove
@@ -36,7 +37,7 @@ class CliPlayer(Player):
         print("Board:")
         print(game.board.display())
         
-        moves = game.board.get_possible_moves(game.turn, game.superpositions)
+        moves = game.get_possible_moves()
         
         print("Possible moves:")
         for idx, move in enumerate(moves):
@@ -61,20 +62,32 @@ class CliPlayer(Player):
 
 class RandomPlayer(Player):
     def get_move(self, game: Game):
-        moves = game.board.get_possible_moves(game.turn, game.superpositions)
+        moves = game.get_possible_moves()
         return random.choice(moves)
 
 
 class MctsPlayer(Player):
+    DEFAULT_ARGS = {
+        "C": 1.4,  # srqt 2
+        "num_searches": 50,  # Budget per rollout
+        "num_simulations": 1,  # Budget for extra simulations per node
+        "attempt": 0,
+        # Positions whose stats are shared between move orders
+        "transposition_table_size": 10000,
+        # Keep searching the tree of the previous move
+        "reuse_tree": True,
+        # Processes that search in parallel
+        "num_workers": 1,
+        # Processes that run the rollouts of a batch of leaves in parallel
+        "rollout_workers": 1,
+        # Branch on the outcomes of measurements with their probabilities
+        "chance_nodes": True,
+    }
+
     def __init__(self, is_white_player: bool, args: dict = None):
         self.args = args
         if args is None:
-            self.args = {
-                "C": 1.4,  # srqt 2
-                "num_searches": 50,  # Budget per rollout
-                "num_simulations": 1,  # Budget for extra simulations per node
-                "attempt": 0,
-            }
+            self.args = MctsPlayer.DEFAULT_ARGS.copy()
 
         self.goal_state = GameState.WHITE_WON
         if not is_white_player:
@@ -82,5 +95,8 @@ class MctsPlayer(Player):
 
         self.mcts = MCTS(self.args, self.goal_state)
 
-    def get_move(self, game: Game):
-        return self.mcts.search(game)
+    def get_move(self, game: Game, time_limit: Optional[float] = None,
+                 num_searches: Optional[int] = None):
+        """The move found by the search, optionally with a budget other than
+        the one from the args."""
+        return self.mcts.search(game, time_limit, num_searches)
@@ -0,0 +1,305 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+"""Backends that simulate the quantum state of the pieces.
+
+A backend builds the state of a superposition (together with its
+partner when it is entangled), gives the chance of the piece being on
+each of its squares and samples a collapse (or lists all of them). The
+game does not care how:
+
+- `AmplitudeBackend` uses the amplitudes kept up to date on the
+  superpositions, the default,
+- `StatevectorBackend` simulates the circuit with numpy,
+- `CirqBackend` simulates the circuit with cirq, the reference,
+- `CrossCheckBackend` runs a backend and checks it against a reference.
+
+Only the amplitude backend is loaded with the game. The circuit
+backends import numpy (and cirq) when they are first used, so that
+starting the api or a classic game does not pay for them.
+"""
+import logging
+import random
+from typing import Callable, Optional
+
+from amplitudes import ZERO_CHANCE
+
+logger = logging.getLogger(__name__)
+
+
+class PieceState:
+    """The superpositions that are simulated together, and whatever the
+    backend built for them."""
+    superpositions: list
+    entangled: bool
+
+    def __init__(self, game, superposition):
+        entanglement = game._find_entanglement(superposition)
+        self.entangled = entanglement is not None
+        self.superpositions = [superposition]
+        if self.entangled:
+            self.superpositions = [entanglement.superposition_taken,
+                                   entanglement.superposition_from]
+
+
+class QuantumBackend:
+    def build_state(self, game, superposition) -> PieceState:
+        raise NotImplementedError()
+
+    def marginals(self, state: PieceState) -> dict[int, float]:
+        """The chance of a piece being on each of its squares."""
+        raise NotImplementedError()
+
+    def sample(self, state: PieceState) -> dict[int, bool]:
+        """Measure all squares of the pieces, returns whether a piece was
+        found on each of them."""
+        raise NotImplementedError()
+
+    def outcomes(self, state: PieceState) -> list[tuple[float, dict[int, bool]]]:
+        """Every possible result of sample, with its probability."""
+        raise NotImplementedError()
+
+
+class AmplitudeBackend(QuantumBackend):
+    def build_state(self, game, superposition):
+        state = PieceState(game, superposition)
+        state.amplitudes = game.get_quantum_state(superposition)
+        return state
+
+    def marginals(self, state):
+        chances = {}
+        for superposition in state.superpositions:
+            register_chances = state.amplitudes.chances(superposition.register)
+            for square in superposition.occupied_squares:
+                chances[square] = register_chances.get(square, 0.0)
+        return chances
+
+    def sample(self, state):
+        return self._square_found(state, state.amplitudes.sample())
+
+    def outcomes(self, state):
+        return [(abs(amplitude) ** 2, self._square_found(state, found))
+                for found, amplitude in state.amplitudes.amplitudes.items()
+                if abs(amplitude) ** 2 > ZERO_CHANCE]
+
+    def _square_found(self, state, found):
+        if not state.entangled:
+            found = (found,)
+        square_found = {}
+        for superposition, found_square in zip(state.superpositions, found):
+            for square in superposition.occupied_squares:
+                square_found[square] = square == found_square
+        return square_found
+
+
+class CircuitBackend(QuantumBackend):
+    """Base for the backends that simulate the circuit of the pieces."""
+    def build_state(self, game, superposition):
+        from quantum_circuit import build_piece_circuit
+        state = PieceState(game, superposition)
+        state.circuit, qubit_by_current_square = build_piece_circuit(
+            state.superpositions[0],
+            state.superpositions[1] if state.entangled else None,
+            game.board.geometry)
+
+        # Squares that the pieces can no longer be on are left out
+        live_squares = {square for s in state.superpositions
+                        for square in s.occupied_squares}
+        state.qubit_by_square = {}
+        for name, qubit in qubit_by_current_square.items():
+            square = int(name.split('-')[1])
+            if square in live_squares:
+                state.qubit_by_square[square] = qubit
+        return state
+
+    def _outcomes(self, state, vector):
+        import numpy as np
+        import statevector
+        # Basis states that only differ on qubits that are not measured
+        # (released ones) give the same result
+        probabilities = statevector.probabilities(vector).ravel()
+        outcomes = {}
+        for index in np.flatnonzero(probabilities > ZERO_CHANCE):
+            bits = np.unravel_index(index, vector.shape)
+            key = tuple((square, bool(bits[qubit] == 1))
+                        for square, qubit in state.qubit_by_square.items())
+            outcomes[key] = outcomes.get(key, 0.0) + float(probabilities[index])
+        return [(probability, dict(key))
+                for key, probability in outcomes.items()]
+
+
+class StatevectorBackend(CircuitBackend):
+    def build_state(self, game, superposition):
+        import statevector
+        state = super().build_state(game, superposition)
+        state.vector = statevector.simulate(state.circuit)
+        return state
+
+    def marginals(self, state):
+        import statevector
+        marginals = statevector.marginals(state.vector)
+        return {square: marginals[qubit]
+                for square, qubit in state.qubit_by_square.items()}
+
+    def sample(self, state):
+        import statevector
+        measurement = statevector.sample(state.vector)
+        return {square: measurement[qubit] == 1
+                for square, qubit in state.qubit_by_square.items()}
+
+    def outcomes(self, state):
+        return self._outcomes(state, state.vector)
+
+
+class CirqBackend(CircuitBackend):
+    """Simulates the circuits with cirq.Simulator, the way the game
+    always did. Slow, but the reference for the other backends."""
+    def __init__(self):
+        import cirq
+        from quantum_circuit import Gate, UNITARIES
+        self.cirq = cirq
+        self.gates = {Gate.X: cirq.X, Gate.S: cirq.S, Gate.CX: cirq.CX,
+                      Gate.CCX: cirq.CCX}
+        self.gates.update({gate: cirq.MatrixGate(unitary)
+                           for gate, unitary in UNITARIES.items()})
+
+    def __reduce__(self):
+        # The cirq module can not be pickled, import it again instead
+        return (CirqBackend, ())
+
+    def to_cirq(self, circuit):
+        qubits = [self.cirq.NamedQubit(f"{i}")
+                  for i in range(circuit.num_qubits)]
+        cirq_circuit = self.cirq.Circuit()
+        for gate, on in circuit.operations:
+            cirq_circuit.append(self.gates[gate].on(*(qubits[q] for q in on)))
+        return cirq_circuit, qubits
+
+    def build_state(self, game, superposition):
+        state = super().build_state(game, superposition)
+        state.cirq_circuit, state.qubits = self.to_cirq(state.circuit)
+        return state
+
+    def marginals(self, state):
+        squares = list(state.qubit_by_square)
+        observables = [self.cirq.Z(state.qubits[state.qubit_by_square[square]])
+                       for square in squares]
+        ev_list = self.cirq.Simulator().simulate_expectation_values(
+            state.cirq_circuit, observables=observables)
+        # Convert from Z eigenvalues (-1, 1) to chance of |1>
+        return {square: abs((1 - ev) / 2.0)
+                for square, ev in zip(squares, ev_list)}
+
+    def sample(self, state):
+        circuit = state.cirq_circuit + self.cirq.Circuit(
+            self.cirq.measure(*state.qubits, key="result"))
+        result = self.cirq.Simulator().run(circuit)
+        measurement = result.measurements["result"][0]
+        return {square: measurement[qubit] == 1
+                for square, qubit in state.qubit_by_square.items()}
+
+    def outcomes(self, state):
+        import numpy as np
+        vector = self.cirq.final_state_vector(
+            state.cirq_circuit, qubit_order=state.qubits,
+            dtype=np.complex128)
+        return self._outcomes(state, vector.reshape((2,) * len(state.qubits)))
+
+
+class Divergence:
+    """Chances of a backend that differ from the reference."""
+    squares: list[int]
+    chances: dict[int, float]
+    reference_chances: dict[int, float]
+
+    def __init__(self, chances, reference_chances, tolerance):
+        self.chances = chances
+        self.reference_chances = reference_chances
+        self.squares = sorted(
+            square for square in set(chances) | set(reference_chances)
+            if square not in chances or square not in reference_chances or
+            abs(chances[square] - reference_chances[square]) > tolerance)
+
+    def __repr__(self):
+        return f"Divergence(chances={self.chances}, " +\
+            f"reference_chances={self.reference_chances})"
+
+
+def log_divergence(divergence: Divergence):
+    logger.warning("Quantum backend diverged from the reference: %r",
+                   divergence)
+
+
+class CrossCheckBackend(QuantumBackend):
+    """Uses the backend, but also runs the reference on a fraction of the
+    calls and reports when their chances differ by more than the
+    tolerance. Sampling only compares the chances before the collapse,
+    the collapse itself comes from the backend.
+
+    With sample_rate 1 and a reporter that raises this is a strict
+    check for tests, with a small sample rate it can run in production.
+    """
+    def __init__(self, backend: QuantumBackend,
+                 reference: Optional[QuantumBackend] = None,
+                 sample_rate: float = 1.0, tolerance: float = 1e-6,
+                 report: Callable[[Divergence], None] = log_divergence):
+        self.backend = backend
+        self.reference = reference if reference is not None else CirqBackend()
+        self.sample_rate = sample_rate
+        self.tolerance = tolerance
+        self.report = report
+        self.checks = 0
+        self.divergences = 0
+        # Separate from the random module, so that checking does not
+        # change the course of a seeded game
+        self.random = random.Random()
+
+    def build_state(self, game, superposition):
+        state = self.backend.build_state(game, superposition)
+        state.check = None
+        if self.random.random() < self.sample_rate:
+            state.check = (game, superposition)
+        return state
+
+    def _check(self, state, chances):
+        if state.check is None:
+            return
+        game, superposition = state.check
+        state.check = None
+
+        self.checks += 1
+        reference = self.reference.build_state(game, superposition)
+        divergence = Divergence(chances, self.reference.marginals(reference),
+                                self.tolerance)
+        if divergence.squares:
+            self.divergences += 1
+            self.report(divergence)
+
+    def marginals(self, state):
+        chances = self.backend.marginals(state)
+        self._check(state, chances)
+        return chances
+
+    def sample(self, state):
+        if state.check is not None:
+            self._check(state, self.backend.marginals(state))
+        return self.backend.sample(state)
+
+    def outcomes(self, state):
+        if state.check is not None:
+            self._check(state, self.backend.marginals(state))
+        return self.backend.outcomes(state)
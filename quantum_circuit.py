@@ -0,0 +1,224 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+from enum import Enum
+
+import numpy as np
+
+from moves import ClassicalMove, SplitMove, MergeMove
+
+
+class Gate(Enum):
+    """The gates used by the piece circuits."""
+    X = 0
+    S = 1
+    CX = 2
+    CCX = 3
+    SPLIT = 4  # Split jump, on (to1, to2, from)
+    MERGE = 5  # Merge jump, on (from1, from2, to)
+
+
+# From quantum chess split
+SPLIT_JUMP = np.array([
+    [1, 0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 1j, 0, 0, 0],
+    [0, 1j/np.sqrt(2), 1/np.sqrt(2), 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, -1/np.sqrt(2), 1j/np.sqrt(2), 0],
+    [0, 1j/np.sqrt(2), -1/np.sqrt(2), 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 1j/np.sqrt(2), -1/np.sqrt(2), 0],
+    [0, 0, 0, 1j, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 1],
+])
+
+# From quantum chess merge jump
+MERGE_JUMP = np.array([
+    [1, 0, 0, 0, 0, 0, 0, 0],
+    [0, 0, -1j/np.sqrt(2), 0, -1j/np.sqrt(2), 0, 0, 0],
+    [0, 0, 1/np.sqrt(2), 0, -1/np.sqrt(2), 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, -1j, 0],
+    [0, -1j, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, -1/np.sqrt(2), 0, -1j/np.sqrt(2), 0, 0],
+    [0, 0, 0, -1j/np.sqrt(2), 0, -1/np.sqrt(2), 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 1],
+])
+
+UNITARIES = {Gate.SPLIT: SPLIT_JUMP, Gate.MERGE: MERGE_JUMP}
+
+
+class QuantumCircuit:
+    """A circuit over numbered qubits that all start in |0>.
+
+    It only describes the gates, simulating it is up to a backend. For
+    the multi-qubit unitaries the first qubit is the most significant
+    one, as in cirq.
+
+    Qubits that are known to be back in |0> can be released, new qubits
+    reuse them so that the circuit stays as narrow as possible.
+    """
+    num_qubits: int
+    operations: list[tuple[Gate, tuple[int, ...]]]
+    free_qubits: list[int]
+
+    def __init__(self):
+        self.num_qubits = 0
+        self.operations = []
+        self.free_qubits = []
+
+    def new_qubit(self) -> int:
+        if self.free_qubits:
+            return self.free_qubits.pop()
+        self.num_qubits += 1
+        return self.num_qubits - 1
+
+    def release(self, qubit: int):
+        """Mark a qubit that is |0> in every branch as free."""
+        self.free_qubits.append(qubit)
+
+    def append(self, gate: Gate, *qubits: int):
+        self.operations.append((gate, qubits))
+
+
+def build_piece_circuit(superposition, superposition_from, geometry):
+    """Build the circuit of a superposition from its history.
+
+    For an entangled pair superposition is the taken piece and
+    superposition_from the piece that took it. Returns the circuit and
+    the qubit for every square, named "<prefix>-<square>" where the
+    prefix tells which of the two pieces it belongs to.
+    """
+    def handle_move(qubit_by_current_square, circuit, prefix):
+        def add_prefix(index):
+            return f"{prefix}-{index}"
+
+        if isinstance(move, ClassicalMove) and not move.is_take_move:
+            # Simply change the mapping of the qubit and then add a S gate for the phase.
+            qubit = qubit_by_current_square[add_prefix(move.from_index)]
+            qubit_by_current_square[add_prefix(move.to_index)] = qubit
+            del qubit_by_current_square[add_prefix(move.from_index)]
+
+            circuit.append(Gate.S, qubit_by_current_square[add_prefix(move.to_index)])
+        elif isinstance(move, SplitMove):
+            # Here we create a new qubit for the superposition
+            qubit_from = qubit_by_current_square[add_prefix(move.from_index)]
+            qubit_by_current_square[add_prefix(move.to_index1)] = circuit.new_qubit()
+            del qubit_by_current_square[add_prefix(move.from_index)]
+
+            qubit_by_current_square[add_prefix(move.to_index2)] = circuit.new_qubit()
+
+            circuit.append(
+                Gate.SPLIT,
+                qubit_by_current_square[add_prefix(move.to_index1)],
+                qubit_by_current_square[add_prefix(move.to_index2)],
+                qubit_from)
+        elif isinstance(move, MergeMove):
+            # Add a qubit for the target
+            qubit_by_current_square[add_prefix(move.to_index)] = circuit.new_qubit()
+
+            # Now apply the matrix
+            circuit.append(
+                Gate.MERGE,
+                qubit_by_current_square[add_prefix(move.from_index1)],
+                qubit_by_current_square[add_prefix(move.from_index2)],
+                qubit_by_current_square[add_prefix(move.to_index)])
+
+            # The piece is never left on from_index1
+            circuit.release(qubit_by_current_square.pop(
+                add_prefix(move.from_index1)))
+
+    # Create a quantum circuit
+    circuit = QuantumCircuit()
+
+    prefix = "to_be_captured"
+    qubit_by_current_square = {
+        f"{prefix}-{superposition.moves[0].from_index}": circuit.new_qubit()
+    }
+
+    # Set up the initial state - we know the initial square was occupied
+    # Initialize the first qubit to |1⟩ (occupied)
+    circuit.append(Gate.X, qubit_by_current_square[
+        f"{prefix}-{superposition.moves[0].from_index}"])
+
+    # Now apply the phase
+    for i in range(superposition.moves_since_measure % 4):
+        circuit.append(Gate.S, qubit_by_current_square[
+            f"{prefix}-{superposition.moves[0].from_index}"])
+
+    taker_prefix = "taker"
+    # Apply the gates corresponding to each move in the superposition's history
+    for move in superposition.moves:
+        if move is None:
+            # This is where the entanglement magic should happen
+            # We set up the circuit for the taken part so far, and
+            # now we need to entangle it with the part that is
+            # taking it. This part doesn't start in superposition!
+            # We apply the first move of the superposition_from on both together.
+            take_move = superposition_from.moves[0]
+
+            # We need a new qubit for the piece that is taking
+            qubit_by_current_square[f"{taker_prefix}-{take_move.from_index}"]\
+                = circuit.new_qubit()
+            # It should be initialized to 1
+            circuit.append(Gate.X,
+                qubit_by_current_square[f"{taker_prefix}-{take_move.from_index}"])
+
+            # Now apply the phase
+            for i in range(superposition_from.moves_since_measure % 4):
+                circuit.append(Gate.S, qubit_by_current_square[
+                    f"{taker_prefix}-{take_move.from_index}"])
+
+            # We also need a new qubit for where the piece is taking to
+            qubit_by_current_square[f"{taker_prefix}-{take_move.to_index}"]\
+                = circuit.new_qubit()
+
+            # We need to find the square that is taken
+            taken_index = geometry.get_jumped_over(
+                take_move.from_index, take_move.to_index)
+
+            # Now we need to apply the gate on these three qubits
+            # This is simply a CCNOT (we only take if both are there)
+            # Followed by two CNOTs to remove the taken piece
+            # Followed by an S gate for the phase change on the moving piece
+            circuit.append(
+                Gate.CCX,
+                qubit_by_current_square[f"{taker_prefix}-{take_move.from_index}"],
+                qubit_by_current_square[f"{prefix}-{taken_index}"],
+                qubit_by_current_square[f"{taker_prefix}-{take_move.to_index}"])
+            circuit.append(
+                Gate.CX,
+                qubit_by_current_square[f"{taker_prefix}-{take_move.to_index}"],
+                qubit_by_current_square[f"{prefix}-{taken_index}"])
+            circuit.append(
+                Gate.CX,
+                qubit_by_current_square[f"{taker_prefix}-{take_move.to_index}"],
+                qubit_by_current_square[f"{taker_prefix}-{take_move.from_index}"])
+            circuit.append(
+                Gate.S,
+                qubit_by_current_square[f"{taker_prefix}-{take_move.to_index}"])
+
+            # The taken square is empty in every branch now
+            circuit.release(qubit_by_current_square.pop(
+                f"{prefix}-{taken_index}"))
+        else:
+            handle_move(qubit_by_current_square, circuit, prefix)
+
+    if superposition_from is not None:
+        # We are entangled, so we still have to do the other part.
+        # We already did the first move
+        for move in superposition_from.moves[1:]:
+            handle_move(qubit_by_current_square, circuit, taker_prefix)
+
+    return circuit, qubit_by_current_square
@@ -15,36 +15,97 @@
 # You should have received a copy of the GNU Affero General Public
 # License along with Cheqqers. If not, see
 # <https://www.gnu.org/licenses/>.
-from pydantic import BaseModel, Field
-
 from moves import Move, ClassicalMove, SplitMove, MergeMove
-from typing import Union, Optional
+from typing import Optional, Union
 from uuid import uuid4, UUID
 
+from amplitudes import SquareAmplitudes, PairAmplitudes
+
+from zobrist import PLACEHOLDER, mix, move_code
 
-class PieceSuperposition(BaseModel):
+
+class PieceSuperposition:
     """Keeps track of the quantum state of one piece over the board
+
+    The amplitudes are kept up to date with the moves. An entangled pair
+    shares one `PairAmplitudes`, register tells which of the two pieces
+    this is. When the state is None (after loading a game) it is
+    computed from the history when needed.
     """
-    uuid: UUID = Field(default_factory=uuid4)
+    uuid: UUID
     occupied_squares: list[int]
-    moves: list[Optional[Union[ClassicalMove, SplitMove, MergeMove]]]
+    moves: list[Optional[Move]]
     moves_since_measure: int
+    digest: int
+    state: Optional[Union[SquareAmplitudes, PairAmplitudes]]
+    register: int
+
+    def __init__(self, occupied_squares: list[int],
+                 moves: list[Optional[Move]], moves_since_measure: int,
+                 uuid: Optional[UUID] = None,
+                 state: Optional[Union[SquareAmplitudes, PairAmplitudes]] = None,
+                 register: int = 0):
+        self.uuid = uuid if uuid is not None else uuid4()
+        self.occupied_squares = occupied_squares
+        self.moves = moves
+        self.moves_since_measure = moves_since_measure
+        self.state = state
+        self.register = register
+        self.compute_digest()
+
+    def compute_digest(self, take_move: Optional[Move] = None):
+        """Hash of the phase and the move history, which is all that
+        determines the state. It does not depend on the uuid, so equal
+        superpositions have equal digests.
+
+        The entanglement placeholder is hashed together with the take
+        move that entangled it, when it is given."""
+        self.digest = mix(0, self.moves_since_measure % 4)
+        for move in self.moves:
+            if move is None:
+                self.digest = mix(mix(self.digest, PLACEHOLDER),
+                                  move_code(take_move) if take_move else 0)
+            else:
+                self.digest = mix(self.digest, move_code(move))
+        return self.digest
 
     @staticmethod
     def create(move: Move, moves_since_measure):
         occupied_squares = None
+        state = None
         if isinstance(move, ClassicalMove):
+            # The state is set when the entanglement is made
             occupied_squares = [move.from_index, move.to_index]
         elif isinstance(move, SplitMove):
             occupied_squares = [move.to_index1, move.to_index2]
+            state = SquareAmplitudes(move.from_index, moves_since_measure)
+            state.apply_move(move)
         else:
             raise 'Superposition can only be start with split or classic take'
         return PieceSuperposition(
             occupied_squares=occupied_squares,
-            moves=[move], moves_since_measure=moves_since_measure)
+            moves=[move], moves_since_measure=moves_since_measure,
+            state=state)
+
+    def clone(self, states: Optional[dict] = None):
+        """Copy with the same uuid, the moves themselves are immutable and
+        shared. The states copied so far are kept in states, so that the
+        clones of an entangled pair share their state again."""
+        superposition = PieceSuperposition.__new__(PieceSuperposition)
+        superposition.uuid = self.uuid
+        superposition.occupied_squares = self.occupied_squares.copy()
+        superposition.moves = self.moves.copy()
+        superposition.moves_since_measure = self.moves_since_measure
+        superposition.digest = self.digest
+        superposition.state = copy_state(self.state, states)
+        superposition.register = self.register
+        return superposition
 
     def apply_move(self, move: Move):
         self.moves.append(move)
+        self.digest = mix(self.digest, move_code(move))
+        if self.state is not None:
+            self.state.apply_move(move, self.register)
         if isinstance(move, ClassicalMove):
             self._apply_classical_move(move)
         elif isinstance(move, SplitMove):
@@ -59,8 +120,10 @@ class PieceSuperposition(BaseModel):
         self.occupied_squares.remove(move.from_index)
         self.occupied_squares.append(move.to_index)
 
-    def insert_entanglement_placeholder(self):
+    def insert_entanglement_placeholder(self, take_move: Optional[Move] = None):
         self.moves.append(None)
+        self.digest = mix(mix(self.digest, PLACEHOLDER),
+                          move_code(take_move) if take_move else 0)
 
     def _apply_split_move(self, move: SplitMove):
         self.occupied_squares.remove(move.from_index)
@@ -73,6 +136,46 @@ class PieceSuperposition(BaseModel):
         return self.occupied_squares == other.occupied_squares
 
 
-class PieceEntanglement(BaseModel):
+class PieceEntanglement:
     superposition_taken: PieceSuperposition
     superposition_from: PieceSuperposition
+
+    def __init__(self, superposition_taken: PieceSuperposition,
+                 superposition_from: PieceSuperposition):
+        self.superposition_taken = superposition_taken
+        self.superposition_from = superposition_from
+
+    def entangle(self, taken_index: int):
+        """Combine the state of the taken piece with the piece that just
+        jumped over it on taken_index."""
+        taker = self.superposition_from
+        self.set_state(PairAmplitudes.entangle(
+            self.superposition_taken.state, taker.moves[0],
+            taker.moves_since_measure, taken_index))
+
+    def replay_state(self, taken_index: int):
+        """Compute the state of the pair from both histories."""
+        taken = self.superposition_taken
+        taker = self.superposition_from
+        self.set_state(PairAmplitudes.from_moves(
+            taken.moves, taken.moves_since_measure,
+            taker.moves, taker.moves_since_measure, taken_index))
+
+    def set_state(self, state: PairAmplitudes):
+        self.superposition_taken.state = state
+        self.superposition_taken.register = 0
+        self.superposition_from.state = state
+        self.superposition_from.register = 1
+
+
+def copy_state(state, states: Optional[dict] = None):
+    """Copy of the state, copied only once per states dict."""
+    if state is None:
+        return None
+    if states is None:
+        return state.copy()
+    copied = states.get(id(state))
+    if copied is None:
+        copied = state.copy()
+        states[id(state)] = copied
+    return copied
@@ -0,0 +1,86 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+"""Statevector simulation of `QuantumCircuit`s with numpy.
+
+The circuits of pieces only use a handful of gates, which are applied
+directly on the state tensor: one axis of size 2 per qubit.
+"""
+import random
+
+import numpy as np
+
+from quantum_circuit import Gate, QuantumCircuit, UNITARIES
+
+# The 3-qubit unitaries as (out, out, out, in, in, in) tensors
+_TENSORS = {gate: unitary.reshape((2,) * 6)
+            for gate, unitary in UNITARIES.items()}
+
+
+def _where(num_qubits, ones):
+    """Index of the part of the state where the given qubits are 1."""
+    index = [slice(None)] * num_qubits
+    for qubit in ones:
+        index[qubit] = 1
+    return tuple(index)
+
+
+def _flip(state, num_qubits, target, controls):
+    index = _where(num_qubits, controls)
+    # The controls are indexed away, so the target axis shifts down
+    axis = target - sum(1 for c in controls if c < target)
+    state[index] = np.flip(state[index], axis).copy()
+
+
+def simulate(circuit: QuantumCircuit) -> np.ndarray:
+    """The final state of the circuit, as a tensor with one axis per
+    qubit."""
+    n = circuit.num_qubits
+    state = np.zeros((2,) * n, dtype=np.complex128)
+    state[(0,) * n] = 1
+
+    for gate, qubits in circuit.operations:
+        if gate == Gate.X:
+            _flip(state, n, qubits[0], ())
+        elif gate == Gate.S:
+            state[_where(n, qubits)] *= 1j
+        elif gate == Gate.CX or gate == Gate.CCX:
+            _flip(state, n, qubits[-1], qubits[:-1])
+        else:
+            state = np.moveaxis(
+                np.tensordot(_TENSORS[gate], state, axes=([3, 4, 5], qubits)),
+                [0, 1, 2], qubits)
+    return state
+
+
+def probabilities(state: np.ndarray) -> np.ndarray:
+    return np.abs(state) ** 2
+
+
+def marginals(state: np.ndarray) -> list[float]:
+    """The chance of measuring |1> for every qubit."""
+    p = probabilities(state)
+    return [float(p[_where(p.ndim, [qubit])].sum()) for qubit in range(p.ndim)]
+
+
+def sample(state: np.ndarray) -> tuple[int, ...]:
+    """Measure all qubits, returns the measured bit per qubit."""
+    p = probabilities(state).ravel()
+    outcome = np.searchsorted(np.cumsum(p), random.random() * p.sum(),
+                              side="right")
+    outcome = min(outcome, p.size - 1)
+    return tuple(int(bit) for bit in np.unravel_index(outcome, state.shape))
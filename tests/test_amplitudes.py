@@ -0,0 +1,122 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+import unittest
+
+import numpy as np
+
+from amplitudes import ZERO_CHANCE, SquareAmplitudes
+from moves import ClassicalMove, SplitMove, MergeMove
+import statevector
+from tests.test_statevector import piece_circuit, random_quantum_games
+
+
+def circuit_amplitudes(game, superposition):
+    """The amplitudes of the circuit of the superposition for the states
+    with one piece per register, keyed by (square,) for a single piece
+    and by (taken square or None, taker square) for a pair."""
+    circuit, qubit_by_current_square, entanglement = piece_circuit(
+        game, superposition.occupied_squares[0])
+    state = statevector.simulate(circuit)
+
+    registers = [{}, {}]
+    for name, qubit in qubit_by_current_square.items():
+        prefix, square = name.split('-')
+        registers[prefix == "taker"][int(square)] = qubit
+    if entanglement is None:
+        keys = [((square,), [qubit])
+                for square, qubit in registers[0].items()]
+    else:
+        registers[0][None] = None
+        keys = [((taken, taker), [q for q in (taken_qubit, taker_qubit)
+                                  if q is not None])
+                for taken, taken_qubit in registers[0].items()
+                for taker, taker_qubit in registers[1].items()]
+
+    amplitudes = {}
+    for key, qubits in keys:
+        index = [0] * circuit.num_qubits
+        for qubit in qubits:
+            index[qubit] = 1
+        amplitudes[key] = state[tuple(index)]
+    # Nothing outside of these states
+    assert np.isclose(sum(abs(a) ** 2 for a in amplitudes.values()), 1)
+    return amplitudes
+
+
+class TestAmplitudes(unittest.TestCase):
+    def assert_amplitudes_equal(self, amplitudes, expected):
+        for key in set(amplitudes) | set(expected):
+            self.assertAlmostEqual(amplitudes.get(key, 0),
+                                   expected.get(key, 0))
+
+    def test_matches_circuit(self):
+        checked = 0
+        pairs = 0
+        for game in random_quantum_games(14, 40):
+            for superposition in game.superpositions:
+                expected = circuit_amplitudes(game, superposition)
+                entanglement = game._find_entanglement(superposition)
+                if entanglement is None:
+                    replayed = SquareAmplitudes.from_moves(
+                        superposition.moves, superposition.moves_since_measure)
+                    amplitudes = {(square,): amplitude for square, amplitude
+                                  in superposition.state.amplitudes.items()}
+                    self.assert_amplitudes_equal(
+                        replayed.amplitudes, superposition.state.amplitudes)
+                else:
+                    pairs += 1
+                    amplitudes = superposition.state.amplitudes
+                self.assert_amplitudes_equal(amplitudes, expected)
+                checked += 1
+        self.assertGreater(checked, 100)
+        self.assertGreater(pairs, 10)
+
+    def test_chances_match_circuit(self):
+        for game in random_quantum_games(15, 20):
+            for square in game.get_all_chances():
+                circuit, qubit_by_current_square, _ =\
+                    piece_circuit(game, square)
+                marginals = statevector.marginals(statevector.simulate(circuit))
+                # The circuit keeps the squares interference emptied,
+                # the game prunes them
+                expected = {int(name.split('-')[1]): marginals[qubit]
+                            for name, qubit in qubit_by_current_square.items()
+                            if marginals[qubit] >= ZERO_CHANCE}
+                chances = game._get_chances_for(square)
+                self.assertEqual(set(chances), set(expected))
+                for s, chance in chances.items():
+                    self.assertAlmostEqual(chance, expected[s])
+
+    def test_merge_interference(self):
+        state = SquareAmplitudes.from_moves([
+            SplitMove(is_take_move=False, from_index=0, to_index1=4, to_index2=5),
+            ClassicalMove(is_take_move=False, from_index=4, to_index=8),
+            MergeMove(is_take_move=False, from_index1=8, from_index2=5,
+                      to_index=9),
+        ], 0)
+        chances = state.chances()
+        self.assertAlmostEqual(chances.get(8, 0), 0)
+        self.assertAlmostEqual(chances[5] + chances[9], 1)
+
+    def test_sample_never_picks_empty_squares(self):
+        state = SquareAmplitudes(3)
+        state.apply_move(SplitMove(is_take_move=False, from_index=3,
+                                   to_index1=6, to_index2=7))
+        state.amplitudes[6] = 0j
+        state.amplitudes[7] = 1j
+        self.assertTrue(all(state.sample() == 7 for _ in range(20)))
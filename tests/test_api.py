@@ -0,0 +1,50 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+import unittest
+import warnings
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from fastapi.testclient import TestClient
+
+import api
+
+
+class TestApi(unittest.TestCase):
+    def test_every_game_has_its_own_opponent(self):
+        client = TestClient(api.app)
+        states = [client.get("/start", params={"game_type": game_type}).json()
+                  for game_type in ["0", "3"]]
+        self.assertNotEqual(states[0]["game_id"], states[1]["game_id"])
+
+        for state in states:
+            after = client.post("/move/0", json=state,
+                                params={"do_ai_move": True}).json()
+            self.assertEqual(after["game_id"], state["game_id"])
+            self.assertEqual(after["turn"], state["turn"])
+
+        players = [api.opponents.get(state["game_id"])[0] for state in states]
+        self.assertIsNot(players[0], players[1])
+
+    def test_least_recently_used_opponent_is_dropped(self):
+        opponents = api.Opponents(max_size=1)
+        first, _ = opponents.get("a")
+        self.assertIs(opponents.get("a")[0], first)
+        opponents.get("b")
+        self.assertEqual(list(opponents.players), ["b"])
+        self.assertIsNot(opponents.get("a")[0], first)
@@ -19,6 +19,7 @@ import unittest
 import statistics
 import random
 
+from board import build_superposition_index
 from enums import GameState, GameType
 from game import Game
 from moves import SplitMove, ClassicalMove
@@ -68,3 +69,22 @@ class TestEntanglementGame(unittest.TestCase):
         self.assertLess(white_won, 45)
         self.assertGreater(black_won, 20)
         self.assertLess(black_won, 45)
+
+    def test_quantum_indexes(self, board_size=8, start_rows=3):
+        """The square and entanglement indexes follow the superpositions"""
+        for _ in range(10):
+            game = Game(board_size, start_rows, GameType.ENTANGLEMENT)
+            while game.get_game_state() == GameState.IN_PROGRESS:
+                game.apply_move(random.choice(game.get_possible_moves()))
+
+                self.assertEqual(
+                    game.superposition_index,
+                    build_superposition_index(game.superpositions))
+                self.assertEqual(len(game.entanglement_index),
+                                 2 * len(game.entanglements))
+                for entanglement in game.entanglements:
+                    for superposition in [entanglement.superposition_taken,
+                                          entanglement.superposition_from]:
+                        self.assertIs(
+                            game.entanglement_index[superposition.uuid],
+                            entanglement)
@@ -66,3 +66,46 @@ class TestGameChances:
         chances = game.get_all_chances()
         assert chances[xy[(0, 2)]] == approx(0.5)
         assert chances[xy[(3, 1)]] == approx(0.5)
+
+    def test_cached_chances_follow_moves(self, game, xy):
+        assert game.get_all_chances() == {}
+        game.get_all_chances()[0] = 1.0  # Callers get their own copy
+        assert game.get_all_chances() == {}
+
+        game.apply_move(
+            SplitMove(
+                is_take_move=False, from_index=xy[(2, 0)],
+                to_index1=xy[(1, 1)], to_index2=xy[(3, 1)]))
+        chances = game.get_all_chances()
+        assert chances[xy[(1, 1)]] == approx(0.5)
+
+        game.measure(xy[(1, 1)])
+        assert game.get_all_chances() == {}
+
+    def test_unchanged_superpositions_are_not_simulated(self, game, xy, monkeypatch):
+        game.apply_move(
+            SplitMove(
+                is_take_move=False, from_index=xy[(2, 0)],
+                to_index1=xy[(1, 1)], to_index2=xy[(3, 1)]))
+        chances = game.get_all_chances()
+
+        simulated = []
+        get_chances_for = game._get_chances_for
+        monkeypatch.setattr(game, "_get_chances_for",
+                            lambda i: simulated.append(i) or get_chances_for(i))
+
+        # A classical move of another piece
+        game.apply_move(
+            ClassicalMove(is_take_move=False,
+                          from_index=xy[(1, 7)], to_index=xy[(0, 6)]))
+        assert game.get_all_chances() == chances
+        assert simulated == []
+
+        # Moving the superposition does
+        game.apply_move(
+            ClassicalMove(is_take_move=False,
+                          from_index=xy[(1, 1)], to_index=xy[(0, 2)]))
+        chances = game.get_all_chances()
+        assert chances[xy[(0, 2)]] == approx(0.5)
+        assert xy[(1, 1)] not in chances
+        assert len(simulated) == 1
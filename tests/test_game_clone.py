@@ -0,0 +1,89 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+import pickle
+import unittest
+import random
+
+from enums import GameState, GameType
+from game import Game
+
+
+def game_snapshot(game):
+    return (list(game.board.piece_map), list(game.board.classic_occupancy),
+            list(game.moves), game.turn, game.moves_since_take,
+            [(s.uuid, list(s.occupied_squares), list(s.moves),
+              s.moves_since_measure) for s in game.superpositions],
+            [(e.superposition_taken.uuid, e.superposition_from.uuid)
+             for e in game.entanglements])
+
+
+class TestGameClone(unittest.TestCase):
+    def test_clone_is_independent(self):
+        random.seed(9)
+        for game_type in GameType:
+            for _ in range(5):
+                game = Game(8, 3, game_type)
+                while game.get_game_state() == GameState.IN_PROGRESS\
+                      and len(game.moves) < 150:
+                    clone = game.clone()
+                    self.assertEqual(game_snapshot(clone), game_snapshot(game))
+
+                    # Playing on in the clone leaves the original alone
+                    before = game_snapshot(game)
+                    clone.apply_move(random.choice(clone.get_possible_moves()))
+                    self.assertEqual(game_snapshot(game), before)
+
+                    game.apply_move(random.choice(game.get_possible_moves()))
+
+    def test_clone_keeps_entanglement_links(self):
+        random.seed(4)
+        found = False
+        for _ in range(50):
+            game = Game(5, 1, GameType.ENTANGLEMENT)
+            while game.get_game_state() == GameState.IN_PROGRESS\
+                  and not game.entanglements:
+                game.apply_move(random.choice(game.get_possible_moves()))
+            if not game.entanglements:
+                continue
+            found = True
+
+            clone = game.clone()
+            for entanglement in clone.entanglements:
+                self.assertTrue(any(entanglement.superposition_taken is s
+                                    for s in clone.superpositions))
+                self.assertTrue(any(entanglement.superposition_from is s
+                                    for s in clone.superpositions))
+                self.assertFalse(any(entanglement.superposition_taken is s
+                                     for s in game.superpositions))
+            self.assertEqual(clone.get_all_chances(), game.get_all_chances())
+        self.assertTrue(found)
+
+    def test_pickled_game_shares_the_tables(self):
+        random.seed(10)
+        game = Game(8, 3, GameType.INTERFERENCE)
+        for _ in range(10):
+            game.apply_move(random.choice(game.get_possible_moves()))
+        data = pickle.dumps(game)
+        copy = pickle.loads(data)
+
+        self.assertLess(len(data), 5000)
+        self.assertIs(copy.board.geometry, game.board.geometry)
+        self.assertIs(copy.board.zobrist_keys, game.board.zobrist_keys)
+        self.assertEqual(game_snapshot(copy), game_snapshot(game))
+        self.assertEqual(copy.get_position_hash(), game.get_position_hash())
+        self.assertEqual(copy.get_possible_moves(), game.get_possible_moves())
@@ -16,8 +16,10 @@
 # License along with Cheqqers. If not, see
 # <https://www.gnu.org/licenses/>.
 import pytest
+from pytest import approx
+import random
 
-from enums import GameType
+from enums import GameType, GameState
 from game import Game
 from game_state_object import GameStateObject
 
@@ -40,3 +42,44 @@ class TestGameStateObject:
         game2 = game_object.to_game()
         game_object2 = GameStateObject.from_game(game2)
         assert game_object == game_object2
+
+    def test_round_trip_quantum_game(self):
+        game = Game(8, 3, GameType.ENTANGLEMENT)
+        for _ in range(60):
+            if game.get_game_state() != GameState.IN_PROGRESS:
+                break
+            game.apply_move(random.choice(game.get_possible_moves()))
+
+            game_object = GameStateObject.model_validate_json(
+                GameStateObject.from_game(game).model_dump_json())
+            game2 = game_object.to_game()
+            assert game2.moves == game.moves
+            assert game2.get_possible_moves() == game.get_possible_moves()
+            assert GameStateObject.from_game(game2) == game_object
+
+    def test_round_trip_quantum_state(self):
+        random.seed(3)
+        entangled = 0
+        for _ in range(5):
+            game = Game(5, 1, GameType.INTERFERENCE)
+            while game.get_game_state() == GameState.IN_PROGRESS\
+                  and len(game.moves) < 60:
+                game.apply_move(random.choice(game.get_possible_moves()))
+                entangled += len(game.entanglements)
+
+                for include_quantum_state in [False, True]:
+                    game_object = GameStateObject.model_validate_json(
+                        GameStateObject.from_game(
+                            game, include_quantum_state).model_dump_json())
+                    game2 = game_object.to_game()
+                    for s2 in game2.superpositions:
+                        assert (s2.state is not None) == include_quantum_state
+                    assert game2.get_all_chances() ==\
+                        approx(game.get_all_chances())
+                    for s, s2 in zip(game.superpositions, game2.superpositions):
+                        s2_state = game2.get_quantum_state(s2)
+                        assert s2_state.amplitudes == approx(s.state.amplitudes)
+                    for e in game2.entanglements:
+                        assert e.superposition_taken.state is\
+                            e.superposition_from.state
+        assert entangled > 0
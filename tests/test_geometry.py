@@ -0,0 +1,52 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+import unittest
+
+from board import Board
+from enums import PieceColor
+from geometry import get_geometry
+
+
+class TestGeometry(unittest.TestCase):
+    def test_shared_between_boards(self):
+        """Boards of the same size share one set of tables"""
+        self.assertIs(Board(8, 3).geometry, Board(8, 1).geometry)
+        self.assertIs(Board(8, 3).xy_index_map, get_geometry(8).xy_index_map)
+        self.assertIsNot(Board(6, 1).geometry, get_geometry(8))
+
+    def test_steps_match_coordinates(self):
+        """Neighbours, landings and jumped over squares agree with (x, y)"""
+        geometry = get_geometry(8)
+        xy = geometry.xy_index_map
+        for i, (x, y) in geometry.index_xy_map.items():
+            for color in PieceColor:
+                dy = 1 if color == PieceColor.WHITE else -1
+                expected = [(x + dx, y + dy) for dx in [-1, 1]
+                            if (x + dx, y + dy) in xy]
+                self.assertEqual(
+                    [geometry.index_xy_map[n]
+                     for n, _ in geometry.forward_steps[color.value][i]],
+                    expected)
+            for neighbour, landing in geometry.crowned_steps[0][i]:
+                if landing is None:
+                    continue
+                nx, ny = geometry.index_xy_map[neighbour]
+                self.assertEqual(geometry.index_xy_map[landing],
+                                 (2 * nx - x, 2 * ny - y))
+                self.assertEqual(geometry.get_jumped_over(i, landing),
+                                 neighbour)
@@ -16,9 +16,11 @@
 # License along with Cheqqers. If not, see
 # <https://www.gnu.org/licenses/>.
 import unittest
+import random
 
 from board import Board
-from enums import PieceColor
+from enums import PieceColor, GameType, GameState
+from game import Game
 from moves import SplitMove, MergeMove, ClassicalMove
 
 
@@ -75,3 +77,17 @@ class TestGetPossibleMoves(unittest.TestCase):
                 # Check that the move is just one square (y changes by 1)
                 self.assertEqual(to_y - from_y, 1,
                                 f"Expected move of one square, but y changes by {to_y - from_y}")
+
+    def test_game_moves_match_board_moves(self):
+        """Test that the incrementally maintained moves of a game match a full board scan."""
+        for game_type in GameType:
+            for _ in range(5):
+                game = Game(8, 3, game_type)
+                plies = 0
+                while game.get_game_state() == GameState.IN_PROGRESS and plies < 150:
+                    moves = game.get_possible_moves()
+                    self.assertEqual(moves, game.board.get_possible_moves(
+                        game.turn, game.superpositions))
+
+                    game.apply_move(random.choice(moves))
+                    plies += 1
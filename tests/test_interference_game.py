@@ -19,8 +19,10 @@ import unittest
 import statistics
 import random
 
-from enums import GameState, GameType
+from amplitudes import ZERO_CHANCE
+from enums import ClassicalSquareState, GameState, GameType
 from game import Game
+from moves import ClassicalMove, SplitMove, MergeMove
 
 
 class TestInterferenceGame(unittest.TestCase):
@@ -61,3 +63,39 @@ class TestInterferenceGame(unittest.TestCase):
         self.assertLess(white_won, 50)
         self.assertGreater(black_won, 15)
         self.assertLess(black_won, 50)
+
+    def test_merge_back_collapses(self):
+        """Merging a split piece back puts it on one square again"""
+        game = Game(8, 1, GameType.INTERFERENCE)
+        xy = game.board.xy_index_map
+        game.apply_move(SplitMove(is_take_move=False, from_index=xy[(2, 0)],
+                                  to_index1=xy[(1, 1)], to_index2=xy[(3, 1)]))
+        game.apply_move(ClassicalMove(is_take_move=False, from_index=xy[(1, 7)],
+                                      to_index=xy[(0, 6)]))
+        game.apply_move(MergeMove(is_take_move=False, from_index1=xy[(1, 1)],
+                                  from_index2=xy[(3, 1)], to_index=xy[(2, 2)]))
+
+        self.assertEqual(game.superpositions, [])
+        self.assertEqual(game.superposition_index, {})
+        self.assertEqual(game.quantum_hash, 0)
+        self.assertEqual(game.get_all_chances(), {})
+        occupancy = game.board.classic_occupancy
+        self.assertEqual(occupancy[xy[(2, 2)]], ClassicalSquareState.OCCUPIED)
+        self.assertEqual(occupancy[xy[(1, 1)]], ClassicalSquareState.EMPTY)
+        self.assertEqual(occupancy[xy[(3, 1)]], ClassicalSquareState.EMPTY)
+
+    def test_no_squares_without_chance(self):
+        random.seed(17)
+        for _ in range(20):
+            game = Game(8, 2, GameType.INTERFERENCE)
+            while game.get_game_state() == GameState.IN_PROGRESS\
+                  and len(game.moves) < 100:
+                game.apply_move(random.choice(game.get_possible_moves()))
+
+                chances = game.get_all_chances()
+                quantum_squares = [
+                    i for i, occupancy in enumerate(game.board.classic_occupancy)
+                    if occupancy == ClassicalSquareState.QUANTUM]
+                self.assertEqual(sorted(chances), quantum_squares)
+                self.assertTrue(all(chance > ZERO_CHANCE
+                                    for chance in chances.values()))
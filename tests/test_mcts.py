@@ -0,0 +1,327 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+import itertools
+import unittest
+import random
+from collections import OrderedDict
+from types import SimpleNamespace
+from unittest import mock
+
+from enums import ClassicalSquareState, GameState, GameType
+from game import Game
+import mcts as mcts_module
+from mcts import MCTS, ChanceNode, Node, SearchBudget, TranspositionTable
+from moves import ClassicalMove, SplitMove
+
+
+class TestMcts(unittest.TestCase):
+    def test_transposition_table_drops_least_recently_used(self):
+        table = TranspositionTable(2)
+        first = table.get(1)
+        table.get(2)
+        self.assertIs(table.get(1), first)
+        table.get(3)
+        self.assertEqual(len(table), 2)
+        self.assertIs(table.get(1), first)
+        self.assertEqual(set(table.entries), {1, 3})
+
+    def test_transpositions_share_stats(self):
+        table = TranspositionTable(100)
+        args = {"C": 1.4}
+
+        def node_after(moves):
+            game = Game(8, 3, GameType.CLASSIC)
+            for move in moves:
+                game.apply_move(move)
+            return Node(game, args, game.turn, transpositions=table)
+
+        white1 = ClassicalMove(from_index=8, to_index=12, is_take_move=False)
+        white2 = ClassicalMove(from_index=11, to_index=15, is_take_move=False)
+        black1 = ClassicalMove(from_index=21, to_index=17, is_take_move=False)
+        black2 = ClassicalMove(from_index=23, to_index=19, is_take_move=False)
+
+        node1 = node_after([white1, black1, white2, black2])
+        node1.backpropagate(1)
+        node2 = node_after([white2, black2, white1, black1])
+        self.assertEqual(node2.visit_count, 1)
+        self.assertEqual(node2.value_sum, 1)
+
+    def test_transpositions_are_per_rule_set(self):
+        table = TranspositionTable(100)
+        args = {"C": 1.4}
+        classic = Game(8, 3, GameType.CLASSIC)
+        Node(classic, args, classic.turn, transpositions=table)\
+            .backpropagate(1)
+
+        interference = Game(8, 3, GameType.INTERFERENCE)
+        node = Node(interference, args, interference.turn,
+                    transpositions=table)
+        self.assertEqual((node.visit_count, node.value_sum), (0, 0))
+        self.assertEqual(len(table), 2)
+
+    def test_search_with_transposition_table(self):
+        random.seed(12)
+        args = {"C": 1.4, "num_searches": 30, "num_simulations": 1,
+                "rollout": 20, "transposition_table_size": 1000}
+        mcts = MCTS(args, GameState.WHITE_WON)
+        game = Game(8, 3, GameType.CLASSIC)
+        move = mcts.search(game)
+        self.assertIn(move, game.get_possible_moves())
+        self.assertGreater(len(mcts.transpositions), 0)
+
+    def test_search_reuses_tree(self):
+        random.seed(13)
+        args = {"C": 1.4, "num_searches": 40, "num_simulations": 1,
+                "rollout": 20, "reuse_tree": True}
+        mcts = MCTS(args, GameState.BLACK_WON)
+        game = Game(8, 3, GameType.CLASSIC)
+        game.apply_move(game.get_possible_moves()[0])
+        game.apply_move(mcts.search(game))
+
+        # A reply that the tree looked at, after which there is a choice
+        played = next(child for child in mcts.root.children
+                      if child.game.get_position_hash()
+                      == game.get_position_hash())
+        reply = next(child for child in played.children
+                     if len(child.game.get_possible_moves()) > 1)
+        game.apply_move(reply.move)
+        visits = reply.visit_count
+
+        mcts.search(game)
+        self.assertIs(mcts.root, reply)
+        self.assertIsNone(mcts.root.parent)
+        self.assertEqual(mcts.root.visit_count, visits + 40)
+
+    def test_unseen_position_gets_fresh_root(self):
+        random.seed(14)
+        args = {"C": 1.4, "num_searches": 10, "num_simulations": 1,
+                "rollout": 20, "reuse_tree": True}
+        mcts = MCTS(args, GameState.WHITE_WON)
+        game = Game(8, 3, GameType.CLASSIC)
+        mcts.search(game)
+
+        other = Game(8, 2, GameType.CLASSIC)
+        self.assertIsNone(mcts.find_node(other))
+        mcts.search(other)
+        self.assertEqual(mcts.root.visit_count, 10)
+
+    def test_parallel_search(self):
+        random.seed(15)
+        args = {"C": 1.4, "num_searches": 20, "num_simulations": 1,
+                "rollout": 20, "num_workers": 2}
+        mcts = MCTS(args, GameState.WHITE_WON)
+        game = Game(5, 1, GameType.INTERFERENCE)
+        for _ in range(2):
+            move = mcts.search(game)
+            self.assertIn(move, game.get_possible_moves())
+            self.assertEqual(len(mcts.worker_visits), 2)
+            for move in game.get_possible_moves():
+                self.assertEqual(
+                    mcts.root_visits.get(move, 0),
+                    sum(visits.get(move, 0) for visits in mcts.worker_visits))
+            game.apply_move(move)
+            game.apply_move(game.get_possible_moves()[0])
+
+    def test_searches_share_worker_processes(self):
+        args = {"C": 1.4, "num_searches": 4, "num_simulations": 1,
+                "rollout": 20, "num_workers": 2}
+        game = Game(5, 1, GameType.INTERFERENCE)
+        MCTS(args, GameState.WHITE_WON).search(game)
+        pool = mcts_module._pools[2]
+        MCTS(args, GameState.WHITE_WON).search(game)
+        self.assertIs(mcts_module._pools[2], pool)
+
+    def test_worker_keeps_a_tree_per_search(self):
+        args = {"C": 1.4, "num_simulations": 1, "rollout": 20,
+                "reuse_tree": True}
+        game = Game(5, 1, GameType.INTERFERENCE)
+        with mock.patch("mcts._worker_mcts", OrderedDict()) as searches:
+            for search_id in ["a", "b", "a"]:
+                mcts_module._search_root_visits(
+                    search_id, game, args, GameState.WHITE_WON, 1, None, 4)
+        self.assertEqual(len(searches), 2)
+        # The tree of "a" was searched further, not the one of "b"
+        visits = {key[0]: mcts.root.visit_count
+                  for key, mcts in searches.items()}
+        self.assertEqual(visits, {"a": 8, "b": 4})
+
+    def test_batched_search(self):
+        random.seed(16)
+        args = {"C": 1.4, "num_searches": 24, "num_simulations": 2,
+                "rollout": 20, "rollout_workers": 2, "rollout_batch_size": 6}
+        mcts = MCTS(args, GameState.WHITE_WON)
+        game = Game(5, 1, GameType.INTERFERENCE)
+        move = mcts.search(game)
+        self.assertIn(move, game.get_possible_moves())
+        self.assertEqual(mcts.root.visit_count, 24)
+
+        # No virtual losses are left behind
+        nodes = [mcts.root]
+        for node in nodes:
+            self.assertEqual(node.stats.virtual_visits, 0)
+            nodes.extend(node.children)
+        self.assertGreater(len(nodes), 10)
+
+    def test_virtual_loss_is_undone(self):
+        game = Game(8, 3, GameType.CLASSIC)
+        root = Node(game, {"C": 1.4}, game.turn)
+        child = root.expand()[0]
+        grandchild = child.expand()[0]
+
+        grandchild.add_virtual_loss()
+        # Looks like a loss to whoever picks the nodes on the path, the
+        # values are for the player who moved into the node
+        for node in [root, child, grandchild]:
+            self.assertEqual((node.visit_count, node.value_sum), (1, 0))
+        grandchild.remove_virtual_loss()
+        for node in [root, child, grandchild]:
+            self.assertEqual((node.visit_count, node.value_sum), (0, 0))
+
+    def test_search_budget(self):
+        budget = SearchBudget(num_searches=3)
+        self.assertEqual([budget.next() for _ in range(4)],
+                         [True, True, True, False])
+        # One iteration is always done
+        budget = SearchBudget(time_limit=0)
+        self.assertEqual([budget.next(), budget.next()], [True, False])
+        with self.assertRaises(ValueError):
+            SearchBudget()
+
+    def test_search_budget_deadline(self):
+        fake_time = SimpleNamespace(perf_counter=lambda: 2.0)
+        with mock.patch("mcts.time", fake_time):
+            # The earlier of the deadline and the end of the time limit
+            self.assertEqual(SearchBudget(deadline=10).deadline, 10)
+            self.assertEqual(SearchBudget(time_limit=5, deadline=1).deadline, 1)
+            self.assertEqual(SearchBudget(time_limit=5, deadline=10).deadline, 7)
+
+    def test_search_with_time_limit(self):
+        random.seed(17)
+        args = {"C": 1.4, "num_searches": 2, "num_simulations": 1,
+                "rollout": 20}
+        mcts = MCTS(args, GameState.WHITE_WON)
+        game = Game(8, 3, GameType.INTERFERENCE)
+
+        # Every look at the clock takes a quarter of a second
+        clock = itertools.count(0, 0.25)
+        fake_time = SimpleNamespace(perf_counter=lambda: next(clock))
+        with mock.patch("mcts.time", fake_time):
+            move = mcts.search(game, time_limit=1.0)
+        self.assertIn(move, game.get_possible_moves())
+        # Only the time limit was given, so the searches in the args do
+        # not stop it early. The clock is read after the first iteration.
+        self.assertEqual(mcts.root.visit_count, 4)
+
+        move = mcts.search(game, num_searches=5)
+        self.assertEqual(mcts.root.visit_count, 5)
+
+        # With the real clock a short limit still gives a move
+        move = mcts.search(game, time_limit=0.01)
+        self.assertIn(move, game.get_possible_moves())
+
+    def test_chance_node_value_is_expectation(self):
+        # Black can take a white piece that is on one of two squares
+        game = Game(8, 1, GameType.SUPERPOSITION)
+        xy = game.board.xy_index_map
+        game.apply_move(SplitMove(is_take_move=False, from_index=xy[(2, 0)],
+                                  to_index1=xy[(1, 1)], to_index2=xy[(3, 1)]))
+        game.board.set_square(xy[(4, 2)], game.board.piece_map[xy[(1, 7)]],
+                              ClassicalSquareState.OCCUPIED)
+        game.board.set_square(xy[(1, 7)], None, ClassicalSquareState.EMPTY)
+        game.refresh()
+
+        root = Node(game, {"C": 1.4, "chance_nodes": True}, game.turn)
+        root.expandable_moves = [ClassicalMove(
+            is_take_move=True, from_index=xy[(4, 2)], to_index=xy[(2, 0)])]
+        outcomes = root.expand()
+        chance = root.children[0]
+        self.assertIsInstance(chance, ChanceNode)
+        self.assertEqual(len(outcomes), 2)
+        for outcome in outcomes:
+            self.assertAlmostEqual(outcome.weight, 0.5)
+
+        # One outcome searched more often does not count for more
+        for _ in range(3):
+            outcomes[0].backpropagate(0)
+        outcomes[1].backpropagate(1)
+        values = [outcome.adjust_for_parent(outcome.value_sum
+                                            / outcome.visit_count)
+                  for outcome in outcomes]
+        self.assertEqual(chance.visit_count, 4)
+        self.assertAlmostEqual(chance.value_sum / chance.visit_count,
+                               sum(values) / 2)
+        self.assertEqual(root.visit_count, 4)
+
+    def test_chance_node_only_looks_up_moves_of_outcomes(self):
+        game = Game(8, 3, GameType.INTERFERENCE)
+        root = Node(game, {"C": 1.4}, game.turn)
+        outcomes = [(0.5, game.clone()), (0.5, game.clone())]
+        with mock.patch.object(Game, "get_possible_moves",
+                               return_value=[]) as get_possible_moves:
+            chance = ChanceNode(game, root.args, game.turn,
+                                root.expandable_moves[0], root, outcomes)
+        self.assertEqual(get_possible_moves.call_count, len(outcomes))
+        self.assertEqual(chance.expandable_moves, [])
+
+    def test_search_with_chance_nodes(self):
+        random.seed(18)
+        args = {"C": 1.4, "num_searches": 300, "num_simulations": 1,
+                "rollout": 20, "chance_nodes": True}
+        mcts = MCTS(args, GameState.WHITE_WON)
+        game = Game(5, 1, GameType.INTERFERENCE)
+        move = mcts.search(game)
+        self.assertIn(move, game.get_possible_moves())
+
+        nodes = [mcts.root]
+        for node in nodes:
+            nodes.extend(node.children)
+        chances = [node for node in nodes if isinstance(node, ChanceNode)]
+        self.assertGreater(len(chances), 0)
+        for chance in chances:
+            self.assertAlmostEqual(
+                sum(child.weight for child in chance.children), 1.0)
+
+    def test_tree_is_not_reused_under_other_rules(self):
+        random.seed(19)
+        args = {"C": 1.4, "num_searches": 20, "num_simulations": 1,
+                "rollout": 20, "reuse_tree": True}
+        mcts = MCTS(args, GameState.WHITE_WON)
+        mcts.search(Game(8, 3, GameType.INTERFERENCE))
+
+        classic = Game(8, 3, GameType.CLASSIC)
+        self.assertIsNone(mcts.find_node(classic))
+        for _ in range(5):
+            self.assertIn(mcts.search(classic), classic.get_possible_moves())
+
+    def test_chance_node_has_its_own_stats(self):
+        random.seed(20)
+        args = {"C": 1.4, "num_searches": 300, "num_simulations": 1,
+                "rollout": 20, "chance_nodes": True,
+                "transposition_table_size": 1000}
+        mcts = MCTS(args, GameState.WHITE_WON)
+        mcts.search(Game(5, 1, GameType.INTERFERENCE))
+
+        nodes = [mcts.root]
+        for node in nodes:
+            nodes.extend(node.children)
+        chances = [node for node in nodes if isinstance(node, ChanceNode)]
+        self.assertGreater(len(chances), 0)
+        for chance in chances:
+            self.assertIsNot(chance.stats, chance.parent.stats)
+            self.assertIs(chance.transpositions, mcts.transpositions)
+            self.assertTrue(chance.is_fully_expanded())
@@ -0,0 +1,116 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+import unittest
+import random
+
+from enums import ClassicalSquareState, GameState, GameType
+from game import Game
+from moves import ClassicalMove, SplitMove
+from quantum_backend import StatevectorBackend
+
+
+def quantum_take_moves(seed, amount, game_type):
+    """Games together with a take move that measures a quantum piece."""
+    random.seed(seed)
+    for _ in range(amount):
+        game = Game(5, 1, game_type)
+        while game.get_game_state() == GameState.IN_PROGRESS\
+              and len(game.moves) < 60:
+            for move in game.get_possible_moves():
+                if not isinstance(move, ClassicalMove) or not move.is_take_move:
+                    continue
+                taken = game.board.geometry.get_jumped_over(
+                    move.from_index, move.to_index)
+                if ClassicalSquareState.QUANTUM in (
+                        game.board.classic_occupancy[move.from_index],
+                        game.board.classic_occupancy[taken]):
+                    yield game, move
+            game.apply_move(random.choice(game.get_possible_moves()))
+
+
+def summary(distribution):
+    return sorted((game.get_position_hash(), probability)
+                  for probability, game in distribution)
+
+
+class TestOutcomeDistribution(unittest.TestCase):
+    def test_take_of_split_piece(self):
+        game = Game(8, 1, GameType.SUPERPOSITION)
+        xy = game.board.xy_index_map
+        game.apply_move(SplitMove(is_take_move=False, from_index=xy[(2, 0)],
+                                  to_index1=xy[(1, 1)], to_index2=xy[(3, 1)]))
+        game.board.set_square(xy[(4, 2)], game.board.piece_map[xy[(1, 7)]],
+                              ClassicalSquareState.OCCUPIED)
+        game.board.set_square(xy[(1, 7)], None, ClassicalSquareState.EMPTY)
+        game.refresh()
+        position_hash = game.get_position_hash()
+
+        move = ClassicalMove(is_take_move=True, from_index=xy[(4, 2)],
+                             to_index=xy[(2, 0)])
+        distribution = game.outcome_distribution(move)
+
+        self.assertEqual(len(distribution), 2)
+        for probability, outcome in distribution:
+            self.assertAlmostEqual(probability, 0.5)
+            self.assertNotIn(ClassicalSquareState.QUANTUM,
+                             outcome.board.classic_occupancy)
+        # Either the piece was on (1, 1), or it was on (3, 1) and taken
+        survived = [outcome.board.classic_occupancy[xy[(1, 1)]]
+                    == ClassicalSquareState.OCCUPIED
+                    for _, outcome in distribution]
+        self.assertEqual(sorted(survived), [False, True])
+        self.assertEqual(game.get_position_hash(), position_hash)
+
+    def test_move_without_measurement(self):
+        game = Game(8, 1, GameType.INTERFERENCE)
+        move = game.get_possible_moves()[0]
+        distribution = game.outcome_distribution(move)
+
+        self.assertEqual(len(distribution), 1)
+        probability, outcome = distribution[0]
+        self.assertEqual(probability, 1.0)
+        game.apply_move(move)
+        self.assertEqual(outcome.get_position_hash(), game.get_position_hash())
+
+    def test_probabilities_sum_to_one(self):
+        checked = 0
+        for game_type in [GameType.SUPERPOSITION, GameType.ENTANGLEMENT,
+                          GameType.INTERFERENCE]:
+            for game, move in quantum_take_moves(31, 5, game_type):
+                distribution = game.outcome_distribution(move)
+                self.assertAlmostEqual(
+                    sum(probability for probability, _ in distribution), 1.0)
+                # Takes that entangle do not measure
+                if len(distribution) > 1:
+                    checked += 1
+        self.assertGreater(checked, 20)
+
+    def test_backends_agree(self):
+        checked = 0
+        for game, move in quantum_take_moves(32, 5, GameType.INTERFERENCE):
+            reference = game.clone()
+            reference.backend = StatevectorBackend()
+            expected = summary(reference.outcome_distribution(move))
+            self.assertEqual(len(game.outcome_distribution(move)),
+                             len(expected))
+            for (h, probability), (expected_h, expected_probability)\
+                    in zip(summary(game.outcome_distribution(move)), expected):
+                self.assertEqual(h, expected_h)
+                self.assertAlmostEqual(probability, expected_probability)
+            checked += 1
+        self.assertGreater(checked, 10)
@@ -0,0 +1,55 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+import copy
+import pickle
+import unittest
+
+from enums import PieceColor
+from game_state_object import PieceObject
+from piece import Piece
+
+
+class TestPiece(unittest.TestCase):
+    def test_pieces_are_interned(self):
+        piece = Piece(color=PieceColor.WHITE, crowned=False)
+        self.assertIs(piece, Piece(color=PieceColor.WHITE, crowned=False))
+        self.assertIs(piece, Piece.from_code(piece.code))
+        self.assertIs(copy.deepcopy(piece), piece)
+        self.assertIs(pickle.loads(pickle.dumps(piece)), piece)
+        with self.assertRaises(AttributeError):
+            piece.crowned = True
+
+    def test_phase_and_crown(self):
+        piece = Piece(color=PieceColor.BLACK, crowned=False)
+        for i in range(1, 9):
+            piece = piece.apply_phase()
+            self.assertEqual(piece.moves_since_measure, i % 4)
+            self.assertEqual(piece.color, PieceColor.BLACK)
+            self.assertFalse(piece.crowned)
+
+        crowned = piece.crown()
+        self.assertTrue(crowned.crowned)
+        self.assertEqual(crowned.moves_since_measure, piece.moves_since_measure)
+        self.assertIs(crowned.crown(), crowned)
+
+    def test_serialization(self):
+        piece = Piece(color=PieceColor.BLACK, crowned=True, moves_since_measure=3)
+        piece_object = PieceObject.from_piece(piece)
+        self.assertEqual(piece_object.model_dump(mode="json"), {
+            "color": 1, "crowned": True, "moves_since_measure": 3})
+        self.assertIs(piece_object.to_piece(), piece)
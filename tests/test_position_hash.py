@@ -0,0 +1,84 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+import unittest
+import random
+
+from enums import GameState, GameType
+from game import Game
+from moves import ClassicalMove, SplitMove
+
+
+class TestPositionHash(unittest.TestCase):
+    def test_incremental_hash_matches_recomputed(self):
+        random.seed(11)
+        for game_type in GameType:
+            for _ in range(5):
+                game = Game(8, 3, game_type)
+                hashes = []
+                while game.get_game_state() == GameState.IN_PROGRESS\
+                      and len(game.moves) < 150:
+                    hashes.append(game.get_position_hash())
+                    game.apply_move(random.choice(game.get_possible_moves()),
+                                    record_undo=True)
+
+                    recomputed = game.clone()
+                    recomputed.refresh()
+                    self.assertEqual(game.get_position_hash(),
+                                     recomputed.get_position_hash())
+
+                while hashes:
+                    game.undo_move()
+                    self.assertEqual(game.get_position_hash(), hashes.pop())
+
+    def test_transpositions_have_equal_hashes(self):
+        def play(moves):
+            game = Game(8, 3, GameType.INTERFERENCE)
+            for move in moves:
+                game.apply_move(move)
+            return game
+
+        white1 = ClassicalMove(from_index=8, to_index=12, is_take_move=False)
+        white2 = SplitMove(from_index=11, to_index1=14, to_index2=15,
+                           is_take_move=False)
+        black1 = ClassicalMove(from_index=21, to_index=17, is_take_move=False)
+        black2 = ClassicalMove(from_index=23, to_index=19, is_take_move=False)
+
+        game1 = play([white1, black1, white2, black2])
+        game2 = play([white2, black2, white1, black1])
+        self.assertEqual(game1.get_position_hash(), game2.get_position_hash())
+
+        game3 = play([white1, black2, white2, black1])
+        self.assertEqual(game1.get_position_hash(), game3.get_position_hash())
+
+        # A different split gives a different superposition
+        game4 = play([white1, black1,
+                      SplitMove(from_index=10, to_index1=13, to_index2=14,
+                                is_take_move=False),
+                      black2])
+        self.assertNotEqual(game1.get_position_hash(), game4.get_position_hash())
+        game5 = play([white1, black1, white2])
+        self.assertNotEqual(game1.get_position_hash(), game5.get_position_hash())
+
+    def test_rules_are_part_of_the_hash(self):
+        classic = Game(8, 3, GameType.CLASSIC)
+        interference = Game(8, 3, GameType.INTERFERENCE)
+        no_draws = Game(8, 3, GameType.INTERFERENCE, allow_draws=False)
+        self.assertEqual(classic.board.hash, interference.board.hash)
+        self.assertEqual(len({classic.get_position_hash(),
+                              interference.get_position_hash(),
+                              no_draws.get_position_hash()}), 3)
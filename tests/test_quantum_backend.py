@@ -0,0 +1,106 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+import os
+import subprocess
+import sys
+import unittest
+import random
+
+from enums import GameState, GameType
+from game import Game
+from moves import SplitMove
+from quantum_backend import AmplitudeBackend, CirqBackend, CrossCheckBackend,\
+    StatevectorBackend
+
+
+def raise_divergence(divergence):
+    raise AssertionError(f"{divergence!r}")
+
+
+class WrongBackend(AmplitudeBackend):
+    def marginals(self, state):
+        return {square: 0.5 for square in super().marginals(state)}
+
+
+class TestQuantumBackend(unittest.TestCase):
+    def play_checked(self, backend, seed):
+        cross_check = CrossCheckBackend(backend, CirqBackend(),
+                                        report=raise_divergence)
+        random.seed(seed)
+        for _ in range(5):
+            game = Game(5, 1, GameType.INTERFERENCE, backend=cross_check)
+            while game.get_game_state() == GameState.IN_PROGRESS\
+                  and len(game.moves) < 60:
+                game.apply_move(random.choice(game.get_possible_moves()))
+                game.get_all_chances()
+        self.assertGreater(cross_check.checks, 20)
+        self.assertEqual(cross_check.divergences, 0)
+
+    def test_amplitudes_match_cirq(self):
+        self.play_checked(AmplitudeBackend(), 18)
+
+    def test_statevector_matches_cirq(self):
+        self.play_checked(StatevectorBackend(), 19)
+
+    def test_cirq_backend_plays(self):
+        random.seed(20)
+        game = Game(5, 1, GameType.INTERFERENCE, backend=CirqBackend())
+        while game.get_game_state() == GameState.IN_PROGRESS\
+              and len(game.moves) < 60:
+            game.apply_move(random.choice(game.get_possible_moves()))
+
+    def test_divergence_is_reported(self):
+        divergences = []
+        game = Game(8, 1, GameType.INTERFERENCE, backend=CrossCheckBackend(
+            WrongBackend(), AmplitudeBackend(), report=divergences.append))
+        xy = game.board.xy_index_map
+        game.apply_move(SplitMove(is_take_move=False, from_index=xy[(2, 0)],
+                                  to_index1=xy[(1, 1)], to_index2=xy[(3, 1)]))
+        game.apply_move(SplitMove(is_take_move=False, from_index=xy[(1, 7)],
+                                  to_index1=xy[(0, 6)], to_index2=xy[(2, 6)]))
+        game.apply_move(SplitMove(is_take_move=False, from_index=xy[(3, 1)],
+                                  to_index1=xy[(2, 2)], to_index2=xy[(4, 2)]))
+        game.get_all_chances()
+
+        self.assertEqual(len(divergences), 1)
+        # The chance on (1, 1) happens to be right
+        self.assertEqual(divergences[0].squares, [xy[(2, 2)], xy[(4, 2)]])
+
+    def test_sample_rate(self):
+        cross_check = CrossCheckBackend(AmplitudeBackend(), AmplitudeBackend(),
+                                        sample_rate=0)
+        game = Game(8, 1, GameType.INTERFERENCE, backend=cross_check)
+        xy = game.board.xy_index_map
+        game.apply_move(SplitMove(is_take_move=False, from_index=xy[(2, 0)],
+                                  to_index1=xy[(1, 1)], to_index2=xy[(3, 1)]))
+        game.get_all_chances()
+        game.measure(xy[(1, 1)])
+        self.assertEqual(cross_check.checks, 0)
+
+    def test_entry_points_do_not_load_simulators(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        code = ("import sys, api, main\n"
+                "from enums import GameType\n"
+                "from game import Game\n"
+                "game = Game(5, 1, GameType.INTERFERENCE)\n"
+                "game.apply_move(game.get_possible_moves()[-1])\n"
+                "game.get_all_chances()\n"
+                "print(sorted({'numpy', 'cirq'} & set(sys.modules)))")
+        output = subprocess.run([sys.executable, "-c", code], cwd=root,
+                                check=True, capture_output=True, text=True)
+        self.assertEqual(output.stdout.strip(), "[]")
@@ -0,0 +1,106 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+import unittest
+import random
+
+import cirq
+import numpy as np
+
+from enums import ClassicalSquareState, GameState, GameType
+from game import Game
+from quantum_circuit import Gate, QuantumCircuit, UNITARIES,\
+    build_piece_circuit
+import statevector
+
+
+def to_cirq(circuit: QuantumCircuit):
+    qubits = [cirq.NamedQubit(f"{i}") for i in range(circuit.num_qubits)]
+    gates = {Gate.X: cirq.X, Gate.S: cirq.S, Gate.CX: cirq.CX,
+             Gate.CCX: cirq.CCX}
+    cirq_circuit = cirq.Circuit()
+    for gate, on in circuit.operations:
+        if gate in UNITARIES:
+            cirq_gate = cirq.MatrixGate(UNITARIES[gate])
+        else:
+            cirq_gate = gates[gate]
+        cirq_circuit.append(cirq_gate.on(*(qubits[q] for q in on)))
+    return cirq_circuit, qubits
+
+
+def random_quantum_games(seed, amount, game_type=GameType.INTERFERENCE):
+    """Games with quantum squares, after every move."""
+    random.seed(seed)
+    for _ in range(amount):
+        game = Game(5, 1, game_type)
+        while game.get_game_state() == GameState.IN_PROGRESS\
+              and len(game.moves) < 60:
+            game.apply_move(random.choice(game.get_possible_moves()))
+            if ClassicalSquareState.QUANTUM in game.board.classic_occupancy:
+                yield game
+
+
+def piece_circuit(game, square):
+    """The circuit of the piece on the square, and its entanglement."""
+    superposition = game._find_superposition_on_square(square)
+    superposition_from = None
+    entanglement = game._find_entanglement(superposition)
+    if entanglement is not None:
+        superposition = entanglement.superposition_taken
+        superposition_from = entanglement.superposition_from
+    circuit, qubit_by_current_square = build_piece_circuit(
+        superposition, superposition_from, game.board.geometry)
+    return circuit, qubit_by_current_square, entanglement
+
+
+class TestStatevector(unittest.TestCase):
+    def test_matches_cirq(self):
+        checked = 0
+        for game in random_quantum_games(13, 10):
+            square = game.board.classic_occupancy.index(
+                ClassicalSquareState.QUANTUM)
+            circuit, *_ = piece_circuit(game, square)
+
+            cirq_circuit, qubits = to_cirq(circuit)
+            expected = cirq.final_state_vector(
+                cirq_circuit, qubit_order=qubits, dtype=np.complex128)
+            state = statevector.simulate(circuit)
+            np.testing.assert_allclose(state.ravel(), expected, atol=1e-9)
+            checked += 1
+        self.assertGreater(checked, 30)
+
+    def test_marginals_and_sampling(self):
+        circuit = QuantumCircuit()
+        a, b, c = circuit.new_qubit(), circuit.new_qubit(), circuit.new_qubit()
+        circuit.append(Gate.X, c)
+        circuit.append(Gate.SPLIT, a, b, c)
+        state = statevector.simulate(circuit)
+        np.testing.assert_allclose(statevector.marginals(state), [0.5, 0.5, 0])
+
+        random.seed(1)
+        samples = [statevector.sample(state) for _ in range(200)]
+        self.assertTrue(all(s in [(1, 0, 0), (0, 1, 0)] for s in samples))
+        self.assertGreater(samples.count((1, 0, 0)), 60)
+        self.assertGreater(samples.count((0, 1, 0)), 60)
+
+    def test_released_qubits_are_reused(self):
+        circuit = QuantumCircuit()
+        a, b = circuit.new_qubit(), circuit.new_qubit()
+        circuit.release(a)
+        self.assertEqual(circuit.new_qubit(), a)
+        self.assertEqual(circuit.new_qubit(), 2)
+        self.assertEqual(circuit.num_qubits, 3)
@@ -0,0 +1,77 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+import unittest
+import random
+
+from enums import ClassicalSquareState, GameState, GameType
+from game import Game
+from moves import ClassicalMove, SplitMove
+from tests.test_game_clone import game_snapshot
+
+
+class TestUndoMove(unittest.TestCase):
+    def test_undo_restores_every_position(self):
+        random.seed(10)
+        for game_type in GameType:
+            for _ in range(5):
+                game = Game(8, 3, game_type)
+                snapshots = []
+                while game.get_game_state() == GameState.IN_PROGRESS\
+                      and len(game.moves) < 150:
+                    snapshots.append((game_snapshot(game),
+                                      game.get_possible_moves(),
+                                      game.get_all_chances()))
+                    game.apply_move(random.choice(game.get_possible_moves()),
+                                    record_undo=True)
+
+                while snapshots:
+                    game.undo_move()
+                    snapshot, moves, chances = snapshots.pop()
+                    self.assertEqual(game_snapshot(game), snapshot)
+                    self.assertEqual(game.get_possible_moves(), moves)
+                    self.assertEqual(game.get_all_chances(), chances)
+                    # Also when computed from the restored quantum states
+                    self.assertEqual(game._get_all_chances().keys(), chances.keys())
+                    for square, chance in game._get_all_chances().items():
+                        self.assertAlmostEqual(chance, chances[square])
+
+                # The move generation has caught up with the board
+                fresh = Game(8, 3, game_type)
+                self.assertEqual(game.get_possible_moves(),
+                                 fresh.get_possible_moves())
+
+    def test_undo_after_measurement(self):
+        game = Game(5, 1, GameType.SUPERPOSITION)
+        game.apply_move(SplitMove(from_index=1, to_index1=3, to_index2=4,
+                                  is_take_move=False))
+        game.apply_move(ClassicalMove(from_index=11, to_index=9, is_take_move=False))
+        game.apply_move(ClassicalMove(from_index=3, to_index=6, is_take_move=False))
+        before = game_snapshot(game)
+
+        # The take measures the superposition on square 6
+        game.apply_move(ClassicalMove(from_index=9, to_index=3, is_take_move=True),
+                        record_undo=True)
+        self.assertEqual(game.superpositions, [])
+        self.assertNotEqual(game.board.classic_occupancy[6],
+                            ClassicalSquareState.QUANTUM)
+
+        game.undo_move()
+        self.assertEqual(game_snapshot(game), before)
+        self.assertEqual(game.board.classic_occupancy[6],
+                         ClassicalSquareState.QUANTUM)
+        self.assertAlmostEqual(game.get_all_chances()[6], 0.5)
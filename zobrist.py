@@ -0,0 +1,77 @@
+# Copyright 2025 Marien Raat <mail@marienraat.nl>
+#
+# This file is part of Cheqqers.
+#
+# Cheqqers is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cheqqers is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public
+# License along with Cheqqers. If not, see
+# <https://www.gnu.org/licenses/>.
+"""Zobrist keys for hashing game positions.
+
+The keys are drawn from a fixed seed, so a position has the same hash in
+every process (and in the workers of a parallel search).
+"""
+from functools import lru_cache
+import random
+
+from enums import ClassicalSquareState, GameType
+from moves import Move, ClassicalMove, SplitMove, MergeMove
+
+MASK = (1 << 64) - 1
+
+_random = random.Random(0x5eed)
+BLACK_TO_MOVE = _random.getrandbits(64)
+# moves_since_take only matters up to the draw limit
+MOVES_SINCE_TAKE_BUCKETS = 41
+MOVES_SINCE_TAKE = [_random.getrandbits(64)
+                    for _ in range(MOVES_SINCE_TAKE_BUCKETS)]
+PLACEHOLDER = _random.getrandbits(64)
+# The rules are part of the position, the same board under other rules
+# must not share search statistics
+GAME_TYPE = {game_type: _random.getrandbits(64) for game_type in GameType}
+ALLOW_DRAWS = _random.getrandbits(64)
+
+
+@lru_cache(maxsize=None)
+def get_square_keys(num_squares):
+    """Keys per square, indexed by square * 64 + piece code * 4 + occupancy.
+    Empty squares have no key."""
+    square_random = random.Random(num_squares)
+    return [square_random.getrandbits(64)
+            for _ in range(num_squares * 64)]
+
+
+def square_key(keys, index, piece, occupancy):
+    if piece is None or occupancy == ClassicalSquareState.EMPTY:
+        return 0
+    return keys[index * 64 + piece.code * 4 + occupancy.value]
+
+
+def mix(digest, value):
+    """Fold a value into a digest (splitmix64 finalizer)."""
+    z = (digest ^ value) + 0x9E3779B97F4A7C15 & MASK
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9 & MASK
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EB & MASK
+    return z ^ (z >> 31)
+
+
+def move_code(move: Move):
+    """A small integer that identifies the move."""
+    if isinstance(move, ClassicalMove):
+        return 1 | move.is_take_move << 2 | move.from_index << 3\
+            | move.to_index << 10
+    elif isinstance(move, SplitMove):
+        return 2 | move.from_index << 3 | move.to_index1 << 10\
+            | move.to_index2 << 17
+    elif isinstance(move, MergeMove):
+        return 3 | move.from_index1 << 3 | move.from_index2 << 10\
+            | move.to_index << 17